@@ -0,0 +1,293 @@
+"""HTTP load benchmark for every MADR router.
+
+Seeds a database with the factories from `tests/conftest.py`, drives each
+scenario with a fixed number of concurrent clients and reports latency
+percentiles and throughput. Results can be saved and later compared
+against a stored baseline:
+
+    python -m benchmarks.run --save benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+
+By default the app runs in-process on `sqlite+aiosqlite:///bench.db`.
+Point `--database-url` at a local Postgres to benchmark it instead, and
+pass `--base-url` to drive an already running server that uses the same
+database. Against a server, `auth_token` is skipped unless
+`--login-unlimited` says the server runs with `LOGIN_RATE_LIMIT_*` raised
+far enough for it; otherwise it would mostly time 429 responses.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import sys
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from time import perf_counter
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src.app import app
+from src.database import get_read_session, get_session
+from src.models import table_registry
+from src.ratelimit import limit_login
+from src.security import get_password_hash
+from tests.conftest import AuthorFactory, BookFactory, UserFactory
+
+PASSWORD = 'bench-password'
+YEARS = range(1800, 2024)
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: str | Callable[[], str]
+    authenticated: bool = False
+    body: dict | Callable[[], dict] | None = None
+    form: dict | None = None
+
+
+@dataclass
+class Result:
+    name: str
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+
+    def report(self) -> dict:
+        quantiles = statistics.quantiles(self.latencies, n=100)
+        return {
+            'requests': len(self.latencies),
+            'errors': self.errors,
+            'rps': round(len(self.latencies) / self.elapsed, 1),
+            'p50_ms': round(quantiles[49] * 1000, 2),
+            'p95_ms': round(quantiles[94] * 1000, 2),
+            'p99_ms': round(quantiles[98] * 1000, 2),
+        }
+
+
+def scenarios(args, user_email: str) -> list[Scenario]:
+    counter = itertools.count()
+    book_ids = itertools.cycle(range(1, args.books + 1))
+    author_ids = itertools.cycle(range(1, args.authors + 1))
+    years = itertools.cycle(YEARS)
+
+    return [
+        Scenario(
+            'auth_token',
+            'POST',
+            '/auth/token',
+            form={'username': user_email, 'password': PASSWORD},
+        ),
+        Scenario('book_get', 'GET', lambda: f'/book/{next(book_ids)}'),
+        Scenario('book_list', 'GET', '/book/?limit=20'),
+        Scenario('book_list_1000', 'GET', '/book/?limit=1000'),
+        Scenario(
+            'book_list_year', 'GET', lambda: f'/book/?year={next(years)}'
+        ),
+        Scenario('book_search', 'GET', '/book/?name=book_1'),
+        Scenario('author_get', 'GET', lambda: f'/author/{next(author_ids)}'),
+        Scenario('author_search', 'GET', '/author/?name=author_1'),
+        Scenario(
+            'book_create',
+            'POST',
+            '/book/',
+            authenticated=True,
+            body=lambda: {
+                'year': 2000,
+                'title': f'bench book {next(counter)}',
+                'author_id': next(author_ids),
+            },
+        ),
+        Scenario(
+            'book_update',
+            'PATCH',
+            lambda: f'/book/{next(book_ids)}',
+            authenticated=True,
+            body=lambda: {'year': next(years)},
+        ),
+        Scenario(
+            'author_create',
+            'POST',
+            '/author/',
+            authenticated=True,
+            body=lambda: {'name': f'bench author {next(counter)}'},
+        ),
+    ]
+
+
+def _resolve(value):
+    return value() if callable(value) else value
+
+
+async def seed(engine, args) -> str:
+    async with engine.begin() as conn:
+        await conn.run_sync(table_registry.metadata.drop_all)
+        await conn.run_sync(table_registry.metadata.create_all)
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        user = UserFactory(password=get_password_hash(PASSWORD))
+        session.add(user)
+        session.add_all(AuthorFactory.create_batch(args.authors))
+        await session.commit()
+
+        for start in range(0, args.books, 10_000):
+            size = min(10_000, args.books - start)
+            session.add_all(
+                BookFactory(
+                    year=YEARS[(start + n) % len(YEARS)],
+                    author_id=(start + n) % args.authors + 1,
+                )
+                for n in range(size)
+            )
+            await session.commit()
+
+    return user.email
+
+
+async def run_scenario(client, scenario, args, headers) -> Result:
+    result = Result(scenario.name)
+    remaining = itertools.count()
+
+    async def worker():
+        while next(remaining) < args.requests:
+            start = perf_counter()
+            response = await client.request(
+                scenario.method,
+                _resolve(scenario.path),
+                json=_resolve(scenario.body),
+                data=scenario.form,
+                headers=headers if scenario.authenticated else None,
+            )
+            result.latencies.append(perf_counter() - start)
+            if response.status_code >= HTTPStatus.BAD_REQUEST:
+                result.errors += 1
+
+    start = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    result.elapsed = perf_counter() - start
+
+    return result
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, current in report.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f'{name}: p95 {previous["p95_ms"]}ms -> {current["p95_ms"]}ms'
+            )
+        if current['rps'] < previous['rps'] * (1 - tolerance):
+            regressions.append(
+                f'{name}: rps {previous["rps"]} -> {current["rps"]}'
+            )
+    return regressions
+
+
+def print_report(report: dict):
+    columns = ['requests', 'errors', 'rps', 'p50_ms', 'p95_ms', 'p99_ms']
+    print(f'{"scenario":<16}' + ''.join(f'{c:>10}' for c in columns))
+    for name, row in report.items():
+        print(f'{name:<16}' + ''.join(f'{row[c]:>10}' for c in columns))
+
+
+async def main(args) -> int:
+    engine = create_async_engine(args.database_url)
+    user_email = await seed(engine, args)
+
+    async def get_session_override():
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            yield session
+
+    if args.base_url:
+        transport = None
+        base_url = args.base_url
+    else:
+        app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+        # auth_token measures Argon2 throughput, not the login limiter.
+        app.dependency_overrides[limit_login] = lambda: None
+        transport = httpx.ASGITransport(app=app)
+        base_url = 'http://bench'
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        transport=transport, base_url=base_url, limits=limits
+    ) as client:
+        response = await client.post(
+            '/auth/token',
+            data={'username': user_email, 'password': PASSWORD},
+        )
+        token = response.json()['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        report = {}
+        for scenario in scenarios(args, user_email):
+            if args.only and scenario.name not in args.only:
+                continue
+            if (
+                scenario.name == 'auth_token'
+                and args.base_url
+                and not args.login_unlimited
+            ):
+                print('skipping auth_token: the server limits logins')
+                continue
+            result = await run_scenario(client, scenario, args, headers)
+            report[scenario.name] = result.report()
+
+    app.dependency_overrides.clear()
+    await engine.dispose()
+
+    print_report(report)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        return 1 if regressions else 0
+
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--database-url', default='sqlite+aiosqlite:///bench.db'
+    )
+    parser.add_argument('--base-url', help='drive a running server instead')
+    parser.add_argument(
+        '--login-unlimited',
+        action='store_true',
+        help='the --base-url server has LOGIN_RATE_LIMIT_* relaxed, so run '
+        'auth_token against it',
+    )
+    parser.add_argument('--authors', type=int, default=1_000)
+    parser.add_argument('--books', type=int, default=50_000)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--only', nargs='*', help='scenario names to run')
+    parser.add_argument('--save', help='write the report to this JSON file')
+    parser.add_argument('--baseline', help='compare against this report')
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.1,
+        help='allowed relative regression (default: 0.1)',
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,74 @@
+"""Per-row cost of serving a `limit=1000` book page.
+
+Compares the ORM path (load `Book` instances, validate them through
+`BookList`, dump to JSON) with the lean path used by the list endpoints
+(select the public columns and dump the rows with a precompiled
+`TypeAdapter`):
+
+    python -m benchmarks.serialization
+"""
+
+import argparse
+import asyncio
+from time import perf_counter
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src.models import Author, Book, table_registry
+from src.schemas.books import BookList
+from src.serializers import book_page
+from tests.conftest import BookFactory
+
+
+async def orm_page(session, limit: int) -> bytes:
+    books = (await session.scalars(select(Book).limit(limit))).all()
+    page = BookList.model_validate({'books': books}, from_attributes=True)
+    return page.model_dump_json().encode()
+
+
+async def row_page(session, limit: int) -> bytes:
+    query = select(Book.id, Book.year, Book.title, Book.author_id)
+    rows = (await session.execute(query.limit(limit))).all()
+    return book_page.dump_json({
+        'books': [row._asdict() for row in rows],
+        'next_cursor': None,
+    })
+
+
+async def measure(engine, render, limit: int, rounds: int) -> float:
+    start = perf_counter()
+    for _ in range(rounds):
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            await render(session, limit)
+    return (perf_counter() - start) / (rounds * limit)
+
+
+async def main(args):
+    engine = create_async_engine(args.database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(table_registry.metadata.drop_all)
+        await conn.run_sync(table_registry.metadata.create_all)
+
+    async with AsyncSession(engine) as session:
+        session.add(Author(name='author'))
+        session.add_all(
+            BookFactory(year=1800 + n % 200) for n in range(args.limit)
+        )
+        await session.commit()
+
+    for name, render in [('orm', orm_page), ('rows', row_page)]:
+        per_row = await measure(engine, render, args.limit, args.rounds)
+        print(f'{name:<6}{per_row * 1_000_000:>10.2f} us/row')
+
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--database-url', default='sqlite+aiosqlite:///bench.db'
+    )
+    parser.add_argument('--limit', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
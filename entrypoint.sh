@@ -3,5 +3,5 @@
 # Executa as migrações do banco de dados
 poetry run alembic upgrade head
 
-# Inicia a aplicação
-poetry run uvicorn --host 0.0.0.0 --port 8000 src.app:app
\ No newline at end of file
+# Inicia a aplicação (configuração em gunicorn.conf.py)
+poetry run gunicorn src.app:app
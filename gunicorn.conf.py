@@ -0,0 +1,24 @@
+import multiprocessing
+
+from src.settings import Settings
+
+settings = Settings()
+
+bind = '0.0.0.0:8000'
+worker_class = 'uvicorn.workers.UvicornWorker'
+workers = settings.SERVER_WORKERS or multiprocessing.cpu_count()
+preload_app = settings.SERVER_PRELOAD
+max_requests = settings.SERVER_MAX_REQUESTS
+max_requests_jitter = settings.SERVER_MAX_REQUESTS_JITTER
+
+
+def when_ready(server):
+    # /metrics is kept in process memory: with several workers each scrape
+    # reads whichever worker took the connection, so counters look like
+    # they reset between scrapes. See "Production server" in the README.
+    if workers > 1:
+        server.log.warning(
+            '/metrics is per worker (%d workers): scrape each worker, or '
+            'set SERVER_WORKERS=1 and scale with containers.',
+            workers,
+        )
@@ -0,0 +1,101 @@
+"""apply book stats per statement
+
+Revision ID: 474a9bf1105c
+Revises: f5bddd1abc1a
+Create Date: 2026-10-18 19:20:37.115402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '474a9bf1105c'
+down_revision: Union[str, None] = 'f5bddd1abc1a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# PostgreSQL only: SQLite takes a database lock per write, so its row
+# triggers cannot deadlock and are left as they are.
+
+DELTAS = {
+    'insert': 'SELECT year, author_id, 1 AS delta FROM new_rows',
+    'delete': 'SELECT year, author_id, -1 AS delta FROM old_rows',
+    'update': 'SELECT year, author_id, -1 AS delta FROM old_rows '
+    'UNION ALL SELECT year, author_id, 1 FROM new_rows',
+}
+TRANSITIONS = {
+    'insert': 'NEW TABLE AS new_rows',
+    'delete': 'OLD TABLE AS old_rows',
+    'update': 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+}
+
+
+def stats_merge(deltas: str) -> str:
+    return (
+        'INSERT INTO book_year_stats (year, books) '
+        f'SELECT year, sum(delta) FROM ({deltas}) AS deltas '
+        'GROUP BY year HAVING sum(delta) <> 0 ORDER BY year '
+        'ON CONFLICT (year) '
+        'DO UPDATE SET books = book_year_stats.books + excluded.books; '
+        'INSERT INTO author_year_stats (author_id, year, books) '
+        f'SELECT author_id, year, sum(delta) FROM ({deltas}) AS deltas '
+        'GROUP BY author_id, year HAVING sum(delta) <> 0 '
+        'ORDER BY author_id, year '
+        'ON CONFLICT (author_id, year) '
+        'DO UPDATE SET books = author_year_stats.books + excluded.books;'
+    )
+
+
+def stats_upserts(row: str, delta: int) -> str:
+    return (
+        'INSERT INTO book_year_stats (year, books) '
+        f'VALUES ({row}.year, {delta}) ON CONFLICT (year) '
+        'DO UPDATE SET books = book_year_stats.books + excluded.books; '
+        'INSERT INTO author_year_stats (author_id, year, books) '
+        f'VALUES ({row}.author_id, {row}.year, {delta}) '
+        'ON CONFLICT (author_id, year) '
+        'DO UPDATE SET books = author_year_stats.books + excluded.books;'
+    )
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('DROP FUNCTION IF EXISTS book_stats_apply() CASCADE')
+    for operation, deltas in DELTAS.items():
+        op.execute(
+            f'CREATE OR REPLACE FUNCTION book_stats_{operation}() '
+            'RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN '
+            f'{stats_merge(deltas)} RETURN NULL; END $$'
+        )
+        op.execute(
+            f'CREATE TRIGGER book_stats_{operation} '
+            f'AFTER {operation.upper()} ON books '
+            f'REFERENCING {TRANSITIONS[operation]} '
+            'FOR EACH STATEMENT '
+            f'EXECUTE FUNCTION book_stats_{operation}()'
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for operation in DELTAS:
+        op.execute(f'DROP FUNCTION IF EXISTS book_stats_{operation}() CASCADE')
+    op.execute(
+        'CREATE OR REPLACE FUNCTION book_stats_apply() RETURNS trigger '
+        'LANGUAGE plpgsql AS $$ BEGIN '
+        f"IF TG_OP <> 'INSERT' THEN {stats_upserts('OLD', -1)} END IF; "
+        f"IF TG_OP <> 'DELETE' THEN {stats_upserts('NEW', 1)} END IF; "
+        'RETURN NULL; END $$'
+    )
+    op.execute(
+        'CREATE TRIGGER book_stats AFTER INSERT OR DELETE '
+        'OR UPDATE OF year, author_id ON books '
+        'FOR EACH ROW EXECUTE FUNCTION book_stats_apply()'
+    )
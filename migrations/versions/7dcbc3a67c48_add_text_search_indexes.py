@@ -0,0 +1,76 @@
+"""add text search indexes
+
+Revision ID: 7dcbc3a67c48
+Revises: 7e20a64d10d4
+Create Date: 2026-10-18 10:12:31.204815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7dcbc3a67c48'
+down_revision: Union[str, None] = '7e20a64d10d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_COLUMNS = [('books', 'title'), ('authors', 'name')]
+
+
+def fts_statements(table: str, column: str) -> list[str]:
+    fts = f'{table}_fts'
+    delete_old = (
+        f"INSERT INTO {fts}({fts}, rowid, {column}) "
+        f"VALUES ('delete', old.id, old.{column});"
+    )
+    insert_new = (
+        f'INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});'
+    )
+    return [
+        f'CREATE VIRTUAL TABLE {fts} USING fts5({column}, '
+        f"content='{table}', content_rowid='id', tokenize='trigram')",
+        f'CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} '
+        f'BEGIN {insert_new} END',
+        f'CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} '
+        f'BEGIN {delete_old} END',
+        f'CREATE TRIGGER {fts}_update AFTER UPDATE OF {column} ON {table} '
+        f'BEGIN {delete_old} {insert_new} END',
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table, column in SEARCH_COLUMNS:
+            op.create_index(
+                f'ix_{table}_{column}_trgm',
+                table,
+                [column],
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'},
+            )
+
+    elif dialect == 'sqlite':
+        for table, column in SEARCH_COLUMNS:
+            for statement in fts_statements(table, column):
+                op.execute(statement)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        for table, column in SEARCH_COLUMNS:
+            op.drop_index(f'ix_{table}_{column}_trgm', table_name=table)
+
+    elif dialect == 'sqlite':
+        for table, _ in SEARCH_COLUMNS:
+            op.execute(f'DROP TABLE IF EXISTS {table}_fts')
+            for trigger in ('insert', 'delete', 'update'):
+                op.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{trigger}')
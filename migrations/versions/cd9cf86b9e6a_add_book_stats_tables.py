@@ -0,0 +1,91 @@
+"""add book stats tables
+
+Revision ID: cd9cf86b9e6a
+Revises: 7dcbc3a67c48
+Create Date: 2026-10-18 15:40:12.518307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cd9cf86b9e6a'
+down_revision: Union[str, None] = '7dcbc3a67c48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def stats_upserts(row: str, delta: int) -> str:
+    return (
+        'INSERT INTO book_year_stats (year, books) '
+        f'VALUES ({row}.year, {delta}) ON CONFLICT (year) '
+        'DO UPDATE SET books = book_year_stats.books + excluded.books; '
+        'INSERT INTO author_year_stats (author_id, year, books) '
+        f'VALUES ({row}.author_id, {row}.year, {delta}) '
+        'ON CONFLICT (author_id, year) '
+        'DO UPDATE SET books = author_year_stats.books + excluded.books;'
+    )
+
+
+def trigger_statements(dialect: str) -> list[str]:
+    if dialect == 'postgresql':
+        return [
+            'CREATE OR REPLACE FUNCTION book_stats_apply() RETURNS trigger '
+            'LANGUAGE plpgsql AS $$ BEGIN '
+            f"IF TG_OP <> 'INSERT' THEN {stats_upserts('OLD', -1)} END IF; "
+            f"IF TG_OP <> 'DELETE' THEN {stats_upserts('NEW', 1)} END IF; "
+            'RETURN NULL; END $$',
+            'CREATE TRIGGER book_stats AFTER INSERT OR DELETE '
+            'OR UPDATE OF year, author_id ON books '
+            'FOR EACH ROW EXECUTE FUNCTION book_stats_apply()',
+        ]
+
+    return [
+        'CREATE TRIGGER book_stats_insert AFTER INSERT ON books '
+        f"BEGIN {stats_upserts('new', 1)} END",
+        'CREATE TRIGGER book_stats_delete AFTER DELETE ON books '
+        f"BEGIN {stats_upserts('old', -1)} END",
+        'CREATE TRIGGER book_stats_update '
+        'AFTER UPDATE OF year, author_id ON books '
+        f"BEGIN {stats_upserts('old', -1)} {stats_upserts('new', 1)} END",
+    ]
+
+
+def upgrade() -> None:
+    op.create_table('book_year_stats',
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('books', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('year')
+    )
+    op.create_table('author_year_stats',
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('books', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('author_id', 'year')
+    )
+
+    op.execute(
+        'INSERT INTO book_year_stats (year, books) '
+        'SELECT year, count(*) FROM books GROUP BY year'
+    )
+    op.execute(
+        'INSERT INTO author_year_stats (author_id, year, books) '
+        'SELECT author_id, year, count(*) FROM books GROUP BY author_id, year'
+    )
+
+    for statement in trigger_statements(op.get_bind().dialect.name):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP FUNCTION IF EXISTS book_stats_apply() CASCADE')
+    else:
+        for trigger in ('insert', 'delete', 'update'):
+            op.execute(f'DROP TRIGGER IF EXISTS book_stats_{trigger}')
+
+    op.drop_table('author_year_stats')
+    op.drop_table('book_year_stats')
@@ -0,0 +1,30 @@
+"""add books author_id and year indexes
+
+Revision ID: f5bddd1abc1a
+Revises: cd9cf86b9e6a
+Create Date: 2026-10-18 17:05:44.908113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5bddd1abc1a'
+down_revision: Union[str, None] = 'cd9cf86b9e6a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXED_COLUMNS = ['author_id', 'year']
+
+
+def upgrade() -> None:
+    for column in INDEXED_COLUMNS:
+        op.create_index(f'ix_books_{column}', 'books', [column])
+
+
+def downgrade() -> None:
+    for column in INDEXED_COLUMNS:
+        op.drop_index(f'ix_books_{column}', table_name='books')
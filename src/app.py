@@ -1,8 +1,83 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
+from src.database import ReplicaSet, replicas
+from src.metrics import MetricsMiddleware, metrics
 from src.routers import auth, author, books, users
+from src.schemas.authors import AuthorPublic
+from src.schemas.books import BookPublic
+from src.schemas.users import UserPublic
+from src.security import get_password_hash, hashing_pool
+from src.serializers import author_page, book_page
+from src.settings import Settings
+from src.suggest import author_index, book_index
+
+settings = Settings()
+logger = logging.getLogger('madr.warmup')
+
+
+async def warmup(app: FastAPI, replica_set: ReplicaSet, pool_size: int):
+    """Bring a fresh worker to steady state before it serves traffic.
+
+    The primary must be reachable. A replica that is not gets ejected, as
+    it would be on its first failed request, instead of failing the boot.
+    """
+
+    async def open_connection(db: AsyncEngine):
+        async with db.connect() as conn:
+            await conn.execute(text('SELECT 1'))
+
+    # Holding the connections concurrently makes each pool open them all.
+    async def open_pool(db: AsyncEngine):
+        await asyncio.gather(*(open_connection(db) for _ in range(pool_size)))
+
+    await open_pool(replica_set.primary)
+    for index, replica in enumerate(replica_set.replicas):
+        try:
+            await open_pool(replica)
+        except (exc.SQLAlchemyError, OSError) as error:
+            logger.warning('Replica %d unreachable, ejected: %s', index, error)
+            replica_set.eject(index)
+
+    async with AsyncSession(replica_set.primary) as session:
+        await book_index.refresh(session)
+        await author_index.refresh(session)
 
-app = FastAPI()
+    app.openapi()
+
+    BookPublic.model_validate({
+        'id': 1,
+        'year': 2000,
+        'title': 'warmup',
+        'author_id': 1,
+    })
+    AuthorPublic.model_validate({'id': 1, 'name': 'warmup'})
+    UserPublic.model_validate({
+        'id': 1,
+        'username': 'warmup',
+        'email': 'warmup@example.com',
+    })
+    book_page.dump_json({'books': [], 'next_cursor': None})
+    author_page.dump_json({'authors': [], 'next_cursor': None})
+
+    await hashing_pool.run(get_password_hash, 'warmup')
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.SERVER_WARMUP:
+        await warmup(app, replicas, settings.DATABASE_POOL_SIZE)
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(users.router)
 app.include_router(auth.router)
@@ -11,5 +86,10 @@ app.include_router(author.router)
 
 
 @app.get('/')
-def home_root():
+async def home_root():
     return {'message': 'Root Endpoint!'}
+
+
+@app.get('/metrics', response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    return metrics.render()
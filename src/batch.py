@@ -0,0 +1,51 @@
+from http import HTTPStatus
+
+from fastapi import HTTPException
+from sqlalchemy import ColumnElement, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.settings import Settings
+
+settings = Settings()
+
+
+def parse_ids(raw: str) -> list[int]:
+    try:
+        return [int(part) for part in raw.split(',') if part.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail='Invalid ids, expected comma-separated integers.',
+        )
+
+
+async def fetch_by_ids(
+    session: AsyncSession,
+    query: Select,
+    id_column: ColumnElement,
+    ids: list[int],
+) -> tuple[list[dict], list[int]]:
+    """Rows for `ids` in request order, plus the ids that were not found.
+
+    Repeated ids are returned once, at their first position.
+    """
+    ids = list(dict.fromkeys(ids))
+
+    if len(ids) > settings.BATCH_GET_MAX_IDS:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=f'At most {settings.BATCH_GET_MAX_IDS} ids per request.',
+        )
+
+    if not ids:
+        return [], []
+
+    rows = {
+        row.id: row._asdict()
+        for row in await session.execute(query.where(id_column.in_(ids)))
+    }
+
+    return (
+        [rows[id] for id in ids if id in rows],
+        [id for id in ids if id not in rows],
+    )
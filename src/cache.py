@@ -0,0 +1,212 @@
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from hashlib import blake2b
+from http import HTTPStatus
+from time import monotonic
+from typing import Any
+
+from fastapi import Response
+from pydantic import BaseModel
+
+from src.schemas.base import FilterPage
+from src.settings import Settings
+
+settings = Settings()
+
+
+class TTLCache:
+    """Size-bounded LRU mapping whose entries expire after `ttl` seconds.
+
+    Not thread-safe: it is only touched from the event loop.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        # Bumped by `pop`, so a fill that read the database before an
+        # invalidation can tell and skip storing what it read.
+        self._versions: dict[Any, int] = {}
+        self._epoch = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+
+        if entry is None or entry[0] < monotonic():
+            if entry is not None:
+                self._discard(key)
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def version(self, key) -> tuple[int, int]:
+        """Read before querying; pass to `set` to drop a stale fill."""
+        return self._epoch, self._versions.get(key, 0)
+
+    def set(
+        self,
+        key,
+        value,
+        ttl: float | None = None,
+        version: tuple[int, int] | None = None,
+    ):
+        if self.maxsize <= 0:
+            return
+        if version is not None and version != self.version(key):
+            return
+
+        expires = monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._discard(next(iter(self._data)))
+
+    def _discard(self, key):
+        self._data.pop(key, None)
+
+    def pop(self, key):
+        self._discard(key)
+        if len(self._versions) >= self.maxsize:
+            # A new epoch invalidates every version handed out so far.
+            self._versions.clear()
+            self._epoch += 1
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def clear(self):
+        self._data.clear()
+        self._versions.clear()
+        self._epoch += 1
+
+
+def search_params(filters: FilterPage) -> tuple:
+    """The filters that change a list page, in a canonical order.
+
+    Defaults are left out, as are parameters the query ignores: `offset`
+    next to a cursor, `sort` without a search term and `books_limit`
+    without `include`.
+    """
+    params = filters.model_dump(exclude_defaults=True, exclude={'ids'})
+
+    if not params.get('name'):
+        params.pop('name', None)
+        params.pop('sort', None)
+    if 'cursor' in params:
+        params.pop('offset', None)
+    if 'include' not in params:
+        params.pop('books_limit', None)
+
+    return tuple(sorted(params.items()))
+
+
+class SearchCache(TTLCache):
+    """Rendered list pages keyed by their filters and the generation of
+    every table they read.
+
+    Write handlers `bump` a table after committing, which moves later
+    reads to new keys; pages of older generations are never read again
+    and fall off the LRU end. Generations are per process, so the TTL
+    bounds how long writes made by other workers go unseen.
+
+    `limit` is unbounded, so besides `maxsize` entries the cache holds at
+    most `maxbytes` of bodies, and skips bodies over `max_entry_bytes`.
+    """
+
+    def __init__(
+        self, maxsize: int, ttl: float, maxbytes: int, max_entry_bytes: int
+    ):
+        super().__init__(maxsize, ttl)
+        self.maxbytes = maxbytes
+        self.max_entry_bytes = max_entry_bytes
+        self.nbytes = 0
+        self.generations: Counter[str] = Counter()
+
+    def set(
+        self,
+        key,
+        value: bytes,
+        ttl: float | None = None,
+        version: tuple[int, int] | None = None,
+    ):
+        if len(value) > self.max_entry_bytes:
+            return
+
+        self._discard(key)
+        super().set(key, value, ttl, version)
+        if key in self._data:
+            self.nbytes += len(value)
+
+        while self.nbytes > self.maxbytes:
+            self._discard(next(iter(self._data)))
+
+    def _discard(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.nbytes -= len(entry[1])
+
+    def clear(self):
+        super().clear()
+        self.nbytes = 0
+
+    def bump(self, *tables: str):
+        self.generations.update(tables)
+
+    def key(self, tables: tuple[str, ...], filters: FilterPage) -> tuple:
+        generations = tuple(self.generations[table] for table in tables)
+        return tables, generations, search_params(filters)
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+
+    @classmethod
+    def from_model(cls, model: BaseModel):
+        body = model.model_dump_json().encode()
+        return cls(
+            body=body, etag=f'"{blake2b(body, digest_size=16).hexdigest()}"'
+        )
+
+    def matches(self, if_none_match: str | None) -> bool:
+        if not if_none_match:
+            return False
+
+        tags = {
+            tag.strip().removeprefix('W/') for tag in if_none_match.split(',')
+        }
+        return '*' in tags or self.etag in tags
+
+    def response(self, if_none_match: str | None = None) -> Response:
+        headers = {'ETag': self.etag}
+
+        if self.matches(if_none_match):
+            return Response(
+                status_code=HTTPStatus.NOT_MODIFIED, headers=headers
+            )
+
+        return Response(
+            content=self.body, media_type='application/json', headers=headers
+        )
+
+
+book_cache = TTLCache(
+    maxsize=settings.ENTITY_CACHE_SIZE, ttl=settings.ENTITY_CACHE_TTL
+)
+author_cache = TTLCache(
+    maxsize=settings.ENTITY_CACHE_SIZE, ttl=settings.ENTITY_CACHE_TTL
+)
+search_cache = SearchCache(
+    maxsize=settings.SEARCH_CACHE_SIZE,
+    ttl=settings.SEARCH_CACHE_TTL,
+    maxbytes=settings.SEARCH_CACHE_MAX_BYTES,
+    max_entry_bytes=settings.SEARCH_CACHE_MAX_ENTRY_BYTES,
+)
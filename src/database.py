@@ -1,17 +1,261 @@
+import itertools
+import math
+from dataclasses import dataclass
+from time import monotonic, perf_counter, time
 from typing import Annotated
 
-from fastapi import Depends
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session
+from fastapi import Cookie, Depends, Header, Response
+from sqlalchemy import Insert, Row, event, exc, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from src.settings import Settings
+from src.slow_queries import install_slow_query_log
 
-engine = create_engine(Settings().DATABASE_URL)
+settings = Settings()
 
 
-def get_session():  # pragma: no cover
-    with Session(engine) as session:
+@dataclass
+class PoolStats:
+    checkouts: int = 0
+    checkins: int = 0
+    timeouts: int = 0
+    in_use: int = 0
+    max_in_use: int = 0
+    overflow: int = 0
+    max_overflow: int = 0
+    checkout_wait_total: float = 0.0
+    checkout_wait_max: float = 0.0
+
+    def record_wait(self, seconds: float):
+        self.checkout_wait_total += seconds
+        self.checkout_wait_max = max(self.checkout_wait_max, seconds)
+
+
+# One entry per instrumented engine, keyed by its role ('primary',
+# 'replica_0', ...), so each pool can be sized on its own.
+pool_stats: dict[str, PoolStats] = {}
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited."""
+
+    stats: PoolStats | None = None
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        if self.stats is None:
+            return super()._do_get()
+
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.record_wait(perf_counter() - start)
+
+
+def instrument_pool(engine: AsyncEngine, role: str) -> PoolStats:
+    sync_engine = engine.sync_engine
+    stats = pool_stats[role] = PoolStats()
+    if isinstance(sync_engine.pool, InstrumentedQueuePool):
+        sync_engine.pool.stats = stats
+
+    @event.listens_for(sync_engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.checkouts += 1
+        stats.in_use += 1
+        stats.overflow = max(sync_engine.pool.overflow(), 0)
+        stats.max_in_use = max(stats.max_in_use, stats.in_use)
+        stats.max_overflow = max(stats.max_overflow, stats.overflow)
+
+    @event.listens_for(sync_engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        stats.checkins += 1
+        stats.in_use -= 1
+
+    return stats
+
+
+class ReplicaSet:
+    """Round-robin over read replicas, skipping the ones that recently
+    failed. Clients that wrote within `read_your_writes_seconds` read
+    from the primary instead (see `wrote_recently`)."""
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: list[AsyncEngine],
+        eject_seconds: float,
+        read_your_writes_seconds: float,
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.eject_seconds = eject_seconds
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self.ejected_until = [0.0] * len(replicas)
+        self._next = itertools.count()
+
+        for index, replica in enumerate(replicas):
+            event.listen(
+                replica.sync_engine, 'handle_error', self._on_error(index)
+            )
+
+    def _on_error(self, index: int):
+        def on_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.eject(index)
+
+        return on_error
+
+    def eject(self, index: int):
+        self.ejected_until[index] = monotonic() + self.eject_seconds
+
+    def wrote_recently(self, last_write: str | None) -> bool:
+        """Whether a client's `LAST_WRITE_COOKIE` (a unix timestamp, so it
+        holds across workers) is still inside the window."""
+        try:
+            written_at = float(last_write)
+        except (TypeError, ValueError):
+            return False
+
+        return time() - written_at < self.read_your_writes_seconds
+
+    def choose(self, read_primary: bool = False) -> AsyncEngine:
+        if read_primary or not self.replicas:
+            return self.primary
+
+        now = monotonic()
+
+        for _ in self.replicas:
+            index = next(self._next) % len(self.replicas)
+            if self.ejected_until[index] <= now:
+                return self.replicas[index]
+
+        return self.primary
+
+
+def build_engine(url: str, role: str) -> AsyncEngine:
+    engine = create_async_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+    )
+    instrument_pool(engine, role)
+
+    if settings.SLOW_QUERY_LOG:
+        install_slow_query_log(
+            engine,
+            settings.SLOW_QUERY_THRESHOLD_MS,
+            settings.SLOW_QUERY_LOG_INTERVAL,
+        )
+
+    return engine
+
+
+engine = build_engine(settings.DATABASE_URL, 'primary')
+replicas = ReplicaSet(
+    engine,
+    [
+        build_engine(url, f'replica_{index}')
+        for index, url in enumerate(
+            url.strip()
+            for url in settings.READ_DATABASE_URLS.split(',')
+            if url.strip()
+        )
+    ],
+    settings.READ_REPLICA_EJECT_SECONDS,
+    settings.READ_YOUR_WRITES_SECONDS,
+)
+
+
+LAST_WRITE_COOKIE = 'madr_last_write'
+
+
+def remember_writes(session: AsyncSession, response: Response):
+    """Hand the client a `LAST_WRITE_COOKIE` whenever `session` commits,
+    so its next reads skip the replicas until they have caught up."""
+
+    def set_cookie(sync_session):
+        response.set_cookie(
+            LAST_WRITE_COOKIE,
+            f'{time():.3f}',
+            max_age=max(1, math.ceil(replicas.read_your_writes_seconds)),
+            httponly=True,
+            samesite='lax',
+        )
+
+    event.listen(session.sync_session, 'after_commit', set_cookie)
+
+
+async def get_session(response: Response):  # pragma: no cover
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        remember_writes(session, response)
+        yield session
+
+
+T_Session = Annotated[AsyncSession, Depends(get_session)]
+
+
+async def get_read_session(
+    x_read_primary: Annotated[bool, Header()] = False,
+    madr_last_write: Annotated[str | None, Cookie()] = None,
+):  # pragma: no cover
+    """Session on a read replica. Clients holding a fresh
+    `LAST_WRITE_COOKIE` read from the primary; send `X-Read-Primary: true`
+    to do so explicitly, e.g. from a client that drops cookies."""
+    read_engine = replicas.choose(
+        read_primary=x_read_primary or replicas.wrote_recently(madr_last_write)
+    )
+    async with AsyncSession(read_engine, expire_on_commit=False) as session:
         yield session
 
 
-T_Session = Annotated[Session, Depends(get_session)]
+T_ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
+
+
+def insert_or_ignore(session: AsyncSession, model) -> Insert:
+    """INSERT for `model` that skips rows violating a unique constraint.
+
+    Dialects without ON CONFLICT fall back to a plain INSERT, whose
+    IntegrityError `insert_returning` handles the same way.
+    """
+    dialect = session.bind.dialect.name
+
+    if dialect == 'postgresql':
+        return postgresql.insert(model).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return sqlite.insert(model).on_conflict_do_nothing()
+
+    return insert(model)
+
+
+async def insert_returning(session: AsyncSession, statement) -> Row | None:
+    """Run an INSERT ... RETURNING and commit it.
+
+    Returns the inserted row, or None when a constraint rejected it.
+    """
+    try:
+        row = (await session.execute(statement)).first()
+    except exc.IntegrityError:
+        await session.rollback()
+        return None
+
+    await session.commit()
+
+    return row
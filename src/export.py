@@ -0,0 +1,62 @@
+import csv
+import io
+import json
+from collections.abc import AsyncIterator
+from typing import Literal
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.settings import Settings
+
+settings = Settings()
+
+ExportFormat = Literal['ndjson', 'csv']
+
+MEDIA_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def _to_csv(records) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(records)
+    return buffer.getvalue()
+
+
+def _render(rows, columns: list[str], fmt: ExportFormat) -> str:
+    if fmt == 'ndjson':
+        return ''.join(json.dumps(dict(row)) + '\n' for row in rows)
+
+    return _to_csv([row[column] for column in columns] for row in rows)
+
+
+async def _stream(
+    session: AsyncSession, query: Select, columns: list[str], fmt: ExportFormat
+) -> AsyncIterator[str]:
+    # The request's dependencies are torn down before the body is sent,
+    # so the session is reopened here and closed once the stream ends.
+    try:
+        if fmt == 'csv':
+            yield _to_csv([columns])
+
+        result = await session.stream(
+            query.execution_options(yield_per=settings.EXPORT_CHUNK_SIZE)
+        )
+        async for rows in result.mappings().partitions():
+            yield _render(rows, columns, fmt)
+    finally:
+        await session.close()
+
+
+def export_response(
+    session: AsyncSession, query: Select, fmt: ExportFormat, filename: str
+) -> StreamingResponse:
+    columns = [column.name for column in query.selected_columns]
+
+    return StreamingResponse(
+        _stream(session, query, columns, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}.{fmt}"'
+        },
+    )
@@ -0,0 +1,181 @@
+import json
+from collections.abc import AsyncIterator
+from http import HTTPStatus
+
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import Author, Book
+from src.schemas.books import BookSchema
+from src.suggest import book_index
+
+NDJSON_MEDIA_TYPES = {'application/x-ndjson', 'application/jsonl'}
+# Serialization failure and deadlock: the batch was rolled back as a whole
+# and can simply run again.
+RETRYABLE_SQLSTATES = {'40001', '40P01'}
+BATCH_ATTEMPTS = 3
+
+
+async def iter_ndjson(request: Request):
+    buffer = b''
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+async def iter_request_rows(request: Request):
+    content_type = request.headers.get('content-type', '').split(';')[0]
+
+    if content_type in NDJSON_MEDIA_TYPES:
+        index = 0
+        async for line in iter_ndjson(request):
+            try:
+                yield index, json.loads(line)
+            except ValueError:
+                yield index, ValueError('Invalid JSON.')
+            index += 1
+        return
+
+    try:
+        rows = await request.json()
+    except ValueError:
+        rows = None
+
+    if not isinstance(rows, list):
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail='Expected a JSON array or NDJSON body of books.',
+        )
+
+    for index, row in enumerate(rows):
+        yield index, row
+
+
+def format_validation_error(error: ValidationError) -> str:
+    return '; '.join(
+        f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}"
+        for err in error.errors(include_url=False)
+    )
+
+
+async def insert_rows(session: AsyncSession, rows: list[dict]):
+    """Insert and commit `rows`, or return None if a concurrent write
+    got in the way (a duplicate title, or a deadlock that kept failing)."""
+    for attempt in range(1, BATCH_ATTEMPTS + 1):
+        try:
+            inserted = (
+                await session.execute(
+                    insert(Book).returning(Book.id, Book.title), rows
+                )
+            ).all()
+            await session.commit()
+            return inserted
+        except IntegrityError:
+            await session.rollback()
+            return None
+        except DBAPIError as error:
+            await session.rollback()
+            sqlstate = getattr(error.orig, 'sqlstate', None)
+            if sqlstate not in RETRYABLE_SQLSTATES:
+                raise
+            if attempt == BATCH_ATTEMPTS:
+                return None
+
+
+async def insert_books_batch(
+    session: AsyncSession, batch: list[tuple[int, object]]
+):
+    errors = []
+    books = []
+
+    for index, raw in batch:
+        if isinstance(raw, ValueError):
+            errors.append({'index': index, 'detail': str(raw)})
+            continue
+        try:
+            books.append((index, BookSchema.model_validate(raw)))
+        except ValidationError as error:
+            errors.append({
+                'index': index,
+                'detail': format_validation_error(error),
+            })
+
+    titles = {book.title for _, book in books}
+    author_ids = {book.author_id for _, book in books}
+    existing_titles = set(
+        await session.scalars(select(Book.title).where(Book.title.in_(titles)))
+    )
+    existing_authors = set(
+        await session.scalars(
+            select(Author.id).where(Author.id.in_(author_ids))
+        )
+    )
+
+    rows = []
+    for index, book in books:
+        if book.title in existing_titles:
+            errors.append({
+                'index': index,
+                'detail': f'{book.title} already in MADR.',
+            })
+        elif book.author_id not in existing_authors:
+            errors.append({
+                'index': index,
+                'detail': f'Author with ID {book.author_id} not found.',
+            })
+        else:
+            existing_titles.add(book.title)
+            rows.append((index, book.model_dump()))
+
+    if not rows:
+        return 0, errors
+
+    inserted = await insert_rows(session, [row for _, row in rows])
+
+    if inserted is None:
+        errors.extend(
+            {'index': index, 'detail': 'Conflicting concurrent write.'}
+            for index, _ in rows
+        )
+        return 0, errors
+
+    for id, title in inserted:
+        book_index.add(id, title)
+
+    return len(rows), errors
+
+
+async def ingest_books(
+    session: AsyncSession,
+    rows: AsyncIterator[tuple[int, object]],
+    batch_size: int,
+):
+    inserted = 0
+    errors = []
+    batch = []
+
+    async for row in rows:
+        batch.append(row)
+        if len(batch) < batch_size:
+            continue
+        batch_inserted, batch_errors = await insert_books_batch(session, batch)
+        inserted += batch_inserted
+        errors.extend(batch_errors)
+        batch = []
+
+    if batch:
+        batch_inserted, batch_errors = await insert_books_batch(session, batch)
+        inserted += batch_inserted
+        errors.extend(batch_errors)
+
+    errors.sort(key=lambda error: error['index'])
+
+    return {'inserted': inserted, 'errors': errors}
@@ -0,0 +1,227 @@
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.cache import author_cache, book_cache, search_cache
+from src.database import pool_stats
+from src.security import token_cache, user_cache
+from src.slow_queries import current_request
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+
+@dataclass
+class Histogram:
+    buckets: tuple[float, ...] = LATENCY_BUCKETS
+    counts: list[int] = field(default_factory=list)
+    total: float = 0.0
+    count: int = 0
+
+    def __post_init__(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> list[str]:
+        lines = []
+        cumulative = 0
+        bounds = [*map(str, self.buckets), '+Inf']
+        for bound, bucket_count in zip(bounds, self.counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+        labels = labels.rstrip(',')
+        lines.append(f'{name}_sum{{{labels}}} {self.total}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+@dataclass
+class QueryStats:
+    queries: int = 0
+    seconds: float = 0.0
+
+
+class Metrics:
+    def __init__(self):
+        self.in_flight = 0
+        self.request_duration = defaultdict(Histogram)
+        self.responses = Counter()
+        self.request_queries = defaultdict(
+            lambda: Histogram(QUERY_COUNT_BUCKETS)
+        )
+        self.request_db_seconds = defaultdict(Histogram)
+        self.query_duration = defaultdict(Histogram)
+
+    def observe_request(
+        self, key: tuple[str, str], status: int, seconds: float, db: QueryStats
+    ):
+        self.request_duration[key].observe(seconds)
+        self.responses[(*key, status)] += 1
+        self.request_queries[key].observe(db.queries)
+        self.request_db_seconds[key].observe(db.seconds)
+
+    def render(self) -> str:
+        lines = [
+            '# TYPE madr_http_requests_in_flight gauge',
+            f'madr_http_requests_in_flight {self.in_flight}',
+            '# TYPE madr_http_responses_total counter',
+        ]
+        for (method, route, status), total in sorted(self.responses.items()):
+            lines.append(
+                'madr_http_responses_total'
+                f'{{method="{method}",route="{route}",status="{status}"}} '
+                f'{total}'
+            )
+
+        for name, histograms in [
+            ('madr_http_request_duration_seconds', self.request_duration),
+            ('madr_db_queries_per_request', self.request_queries),
+            ('madr_db_seconds_per_request', self.request_db_seconds),
+        ]:
+            lines.append(f'# TYPE {name} histogram')
+            for (method, route), histogram in sorted(histograms.items()):
+                lines.extend(
+                    histogram.render(
+                        name, f'method="{method}",route="{route}",'
+                    )
+                )
+
+        lines.append('# TYPE madr_db_query_duration_seconds histogram')
+        for operation, histogram in sorted(self.query_duration.items()):
+            lines.extend(
+                histogram.render(
+                    'madr_db_query_duration_seconds',
+                    f'operation="{operation}",',
+                )
+            )
+
+        lines.extend(_render_pool())
+        lines.extend(_render_caches())
+
+        return '\n'.join(lines) + '\n'
+
+
+def _render_pool() -> list[str]:
+    gauges = {
+        'madr_db_pool_in_use': 'in_use',
+        'madr_db_pool_max_in_use': 'max_in_use',
+        'madr_db_pool_overflow': 'overflow',
+        'madr_db_pool_max_overflow': 'max_overflow',
+        'madr_db_pool_checkout_wait_max_seconds': 'checkout_wait_max',
+    }
+    counters = {
+        'madr_db_pool_checkouts_total': 'checkouts',
+        'madr_db_pool_timeouts_total': 'timeouts',
+        'madr_db_pool_checkout_wait_seconds_total': 'checkout_wait_total',
+    }
+    lines = []
+    for kind, values in [('gauge', gauges), ('counter', counters)]:
+        for name, attribute in values.items():
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(
+                f'{name}{{engine="{role}"}} {getattr(stats, attribute)}'
+                for role, stats in sorted(pool_stats.items())
+            )
+    return lines
+
+
+def _render_caches() -> list[str]:
+    caches = {
+        'user': user_cache,
+        'token': token_cache,
+        'book': book_cache,
+        'author': author_cache,
+        'search': search_cache,
+    }
+    lines = ['# TYPE madr_cache_hits_total counter']
+    lines.extend(
+        f'madr_cache_hits_total{{cache="{name}"}} {cache.hits}'
+        for name, cache in caches.items()
+    )
+    lines.append('# TYPE madr_cache_misses_total counter')
+    lines.extend(
+        f'madr_cache_misses_total{{cache="{name}"}} {cache.misses}'
+        for name, cache in caches.items()
+    )
+    return lines
+
+
+metrics = Metrics()
+request_queries: ContextVar[QueryStats | None] = ContextVar(
+    'request_queries', default=None
+)
+
+
+@event.listens_for(Engine, 'before_cursor_execute', named=True)
+def _before_cursor_execute(conn, **kw):
+    conn.info.setdefault('query_start', []).append(perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute', named=True)
+def _after_cursor_execute(conn, statement, **kw):
+    elapsed = perf_counter() - conn.info['query_start'].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper()
+    metrics.query_duration[operation].observe(elapsed)
+
+    stats = request_queries.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += elapsed
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route latency, status counts,
+    requests in flight and the queries each request issued."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        status = 500
+        stats = QueryStats()
+        token = request_queries.set(stats)
+        request_token = current_request.set(scope)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        metrics.in_flight += 1
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = perf_counter() - start
+            metrics.in_flight -= 1
+            request_queries.reset(token)
+            current_request.reset(request_token)
+            route = scope.get('route')
+            key = (scope['method'], route.path if route else 'unmatched')
+            metrics.observe_request(key, status, elapsed, stats)
@@ -1,11 +1,143 @@
 from datetime import datetime
 
-from sqlalchemy import ForeignKey, func
+from sqlalchemy import DDL, ForeignKey, Index, event, func
 from sqlalchemy.orm import Mapped, mapped_column, registry, relationship
 
 table_registry = registry()
 
 
+def trigram_index(table: str, column: str) -> Index:
+    return Index(
+        f'ix_{table}_{column}_trgm',
+        column,
+        postgresql_using='gin',
+        postgresql_ops={column: 'gin_trgm_ops'},
+    ).ddl_if(dialect='postgresql')
+
+
+def fts_ddl(table: str, column: str) -> list[str]:
+    fts = f'{table}_fts'
+    delete_old = (
+        f'INSERT INTO {fts}({fts}, rowid, {column}) '
+        f"VALUES ('delete', old.id, old.{column});"
+    )
+    insert_new = (
+        f'INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});'
+    )
+    return [
+        f'CREATE VIRTUAL TABLE {fts} USING fts5({column}, '
+        f"content='{table}', content_rowid='id', tokenize='trigram')",
+        f'CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} '
+        f'BEGIN {insert_new} END',
+        f'CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} '
+        f'BEGIN {delete_old} END',
+        f'CREATE TRIGGER {fts}_update AFTER UPDATE OF {column} ON {table} '
+        f'BEGIN {delete_old} {insert_new} END',
+    ]
+
+
+def register_fts(model, column: str):
+    table = model.__table__
+    for statement in fts_ddl(table.name, column):
+        event.listen(
+            table, 'after_create', DDL(statement).execute_if(dialect='sqlite')
+        )
+    event.listen(
+        table,
+        'before_drop',
+        DDL(f'DROP TABLE IF EXISTS {table.name}_fts').execute_if(
+            dialect='sqlite'
+        ),
+    )
+
+
+def stats_upserts(row: str, delta: int) -> str:
+    """Add `delta` to the summary counters of the `row` books row."""
+    return (
+        'INSERT INTO book_year_stats (year, books) '
+        f'VALUES ({row}.year, {delta}) ON CONFLICT (year) '
+        'DO UPDATE SET books = book_year_stats.books + excluded.books; '
+        'INSERT INTO author_year_stats (author_id, year, books) '
+        f'VALUES ({row}.author_id, {row}.year, {delta}) '
+        'ON CONFLICT (author_id, year) '
+        'DO UPDATE SET books = author_year_stats.books + excluded.books;'
+    )
+
+
+def stats_merge(deltas: str) -> str:
+    """Add `deltas` (year, author_id, delta rows) to the summary counters.
+
+    Summed per key and upserted in key order, so a statement takes each
+    counter's row lock once and every writer takes them in the same order.
+    """
+    return (
+        'INSERT INTO book_year_stats (year, books) '
+        f'SELECT year, sum(delta) FROM ({deltas}) AS deltas '
+        'GROUP BY year HAVING sum(delta) <> 0 ORDER BY year '
+        'ON CONFLICT (year) '
+        'DO UPDATE SET books = book_year_stats.books + excluded.books; '
+        'INSERT INTO author_year_stats (author_id, year, books) '
+        f'SELECT author_id, year, sum(delta) FROM ({deltas}) AS deltas '
+        'GROUP BY author_id, year HAVING sum(delta) <> 0 '
+        'ORDER BY author_id, year '
+        'ON CONFLICT (author_id, year) '
+        'DO UPDATE SET books = author_year_stats.books + excluded.books;'
+    )
+
+
+# PostgreSQL applies the counters once per statement from its transition
+# tables, instead of once per row: a bulk insert would otherwise lock the
+# counter rows in arrival order and deadlock against another one.
+STATS_DELTAS = {
+    'insert': 'SELECT year, author_id, 1 AS delta FROM new_rows',
+    'delete': 'SELECT year, author_id, -1 AS delta FROM old_rows',
+    'update': 'SELECT year, author_id, -1 AS delta FROM old_rows '
+    'UNION ALL SELECT year, author_id, 1 FROM new_rows',
+}
+STATS_TRANSITIONS = {
+    'insert': 'NEW TABLE AS new_rows',
+    'delete': 'OLD TABLE AS old_rows',
+    'update': 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+}
+
+
+def stats_ddl(dialect: str) -> list[str]:
+    """Triggers keeping the book statistics tables in step with books."""
+    if dialect == 'postgresql':
+        statements = []
+        for operation, deltas in STATS_DELTAS.items():
+            statements += [
+                f'CREATE OR REPLACE FUNCTION book_stats_{operation}() '
+                'RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN '
+                f'{stats_merge(deltas)} RETURN NULL; END $$',
+                f'CREATE TRIGGER book_stats_{operation} '
+                f'AFTER {operation.upper()} ON books '
+                f'REFERENCING {STATS_TRANSITIONS[operation]} '
+                'FOR EACH STATEMENT '
+                f'EXECUTE FUNCTION book_stats_{operation}()',
+            ]
+        return statements
+
+    return [
+        'CREATE TRIGGER book_stats_insert AFTER INSERT ON books '
+        f"BEGIN {stats_upserts('new', 1)} END",
+        'CREATE TRIGGER book_stats_delete AFTER DELETE ON books '
+        f"BEGIN {stats_upserts('old', -1)} END",
+        'CREATE TRIGGER book_stats_update '
+        'AFTER UPDATE OF year, author_id ON books '
+        f"BEGIN {stats_upserts('old', -1)} {stats_upserts('new', 1)} END",
+    ]
+
+
+event.listen(
+    table_registry.metadata,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(
+        dialect='postgresql'
+    ),
+)
+
+
 @table_registry.mapped_as_dataclass
 class User:
     __tablename__ = 'users'
@@ -25,11 +157,14 @@ class User:
 @table_registry.mapped_as_dataclass
 class Book:
     __tablename__ = 'books'
+    __table_args__ = (trigram_index('books', 'title'),)
 
     id: Mapped[int] = mapped_column(init=False, primary_key=True)
-    year: Mapped[int]
+    year: Mapped[int] = mapped_column(index=True)
     title: Mapped[str] = mapped_column(unique=True)
-    author_id: Mapped[int] = mapped_column(ForeignKey('authors.id'))
+    author_id: Mapped[int] = mapped_column(
+        ForeignKey('authors.id'), index=True
+    )
     author: Mapped['Author'] = relationship(
         init=False,
         back_populates='books',
@@ -39,6 +174,7 @@ class Book:
 @table_registry.mapped_as_dataclass
 class Author:
     __tablename__ = 'authors'
+    __table_args__ = (trigram_index('authors', 'name'),)
 
     id: Mapped[int] = mapped_column(init=False, primary_key=True)
     name: Mapped[str] = mapped_column(unique=True)
@@ -47,3 +183,40 @@ class Author:
         back_populates='author',
         cascade='all, delete-orphan',
     )
+
+
+@table_registry.mapped_as_dataclass
+class BookYearStats:
+    __tablename__ = 'book_year_stats'
+
+    year: Mapped[int] = mapped_column(primary_key=True)
+    books: Mapped[int]
+
+
+@table_registry.mapped_as_dataclass
+class AuthorYearStats:
+    __tablename__ = 'author_year_stats'
+
+    author_id: Mapped[int] = mapped_column(primary_key=True)
+    year: Mapped[int] = mapped_column(primary_key=True)
+    books: Mapped[int]
+
+
+register_fts(Book, 'title')
+register_fts(Author, 'name')
+
+for dialect in ('postgresql', 'sqlite'):
+    for statement in stats_ddl(dialect):
+        event.listen(
+            table_registry.metadata,
+            'after_create',
+            DDL(statement).execute_if(dialect=dialect),
+        )
+event.listen(
+    table_registry.metadata,
+    'before_drop',
+    DDL(
+        'DROP FUNCTION IF EXISTS book_stats_insert(), book_stats_delete(), '
+        'book_stats_update() CASCADE'
+    ).execute_if(dialect='postgresql'),
+)
@@ -0,0 +1,60 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from http import HTTPStatus
+
+from fastapi import HTTPException
+from sqlalchemy import ColumnElement, Select
+
+from src.schemas.base import FilterPage
+
+
+def encode_cursor(last_id: int) -> str:
+    payload = json.dumps({'id': last_id}).encode()
+    return urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> int:
+    padding = '=' * (-len(cursor) % 4)
+    try:
+        last_id = json.loads(urlsafe_b64decode(cursor + padding))['id']
+    except (BinasciiError, ValueError, TypeError, KeyError):
+        last_id = None
+
+    if not isinstance(last_id, int):
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST, detail='Invalid cursor.'
+        )
+
+    return last_id
+
+
+def next_cursor(rows: list, page: FilterPage) -> str | None:
+    # A cursor resumes after the last id, which only works on pages in id
+    # order; relevance pages are followed with `offset`.
+    if page.sort != 'id' or not rows or len(rows) < page.limit:
+        return None
+
+    return encode_cursor(rows[-1].id)
+
+
+def paginate(
+    query: Select,
+    id_column: ColumnElement,
+    page: FilterPage,
+    rank: ColumnElement | None = None,
+) -> Select:
+    if page.cursor:
+        if page.sort != 'id':
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST,
+                detail='Cursor pagination requires sort=id.',
+            )
+        query = query.filter(id_column > decode_cursor(page.cursor))
+    else:
+        query = query.offset(page.offset)
+
+    if page.sort == 'relevance' and rank is not None:
+        query = query.order_by(rank)
+
+    return query.order_by(id_column).limit(page.limit)
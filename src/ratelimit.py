@@ -0,0 +1,192 @@
+import asyncio
+import sqlite3
+import threading
+from dataclasses import dataclass
+from http import HTTPStatus
+from math import ceil
+from time import time
+from typing import Annotated
+
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import OAuth2PasswordRequestForm
+
+from src.settings import Settings
+
+settings = Settings()
+
+
+@dataclass(frozen=True)
+class Bucket:
+    capacity: float
+    rate: float  # tokens refilled per second
+
+    @classmethod
+    def per_minute(cls, capacity: float, per_minute: float):
+        return cls(capacity=capacity, rate=per_minute / 60)
+
+    def refill(self, tokens: float, elapsed: float) -> float:
+        return min(self.capacity, tokens + max(elapsed, 0) * self.rate)
+
+    def retry_after(self, tokens: float) -> float:
+        return (1 - tokens) / self.rate
+
+    def full_at(self, tokens: float, now: float) -> float:
+        return now + (self.capacity - tokens) / self.rate
+
+
+class MemoryBackend:
+    """Token buckets kept in this process, spread over `shards` dicts so
+    pruning idle keys only ever walks a fraction of them."""
+
+    def __init__(self, shards: int = 16, max_keys_per_shard: int = 10_000):
+        self.max_keys_per_shard = max_keys_per_shard
+        self._shards = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+    async def take(self, key: str, bucket: Bucket, now: float) -> float:
+        index = hash(key) % len(self._shards)
+        shard = self._shards[index]
+
+        with self._locks[index]:
+            tokens, updated, _ = shard.get(key, (bucket.capacity, now, now))
+            tokens = bucket.refill(tokens, now - updated)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+
+            shard[key] = (tokens, now, bucket.full_at(tokens, now))
+            if len(shard) > self.max_keys_per_shard:
+                self._prune(shard, now)
+
+        return 0.0 if allowed else bucket.retry_after(tokens)
+
+    @staticmethod
+    def _prune(shard: dict, now: float):
+        # A bucket that has refilled is the same as a missing one.
+        for key, (_, _, full_at) in list(shard.items()):
+            if full_at <= now:
+                del shard[key]
+
+    def clear(self):
+        for shard in self._shards:
+            shard.clear()
+
+
+class SQLiteBackend:
+    """Token buckets in a SQLite file, shared by every worker on a host."""
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened on first use so a preloading server never forks it.
+        if self._conn is None:
+            self._conn = sqlite3.connect(
+                self.path,
+                timeout=5,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit_buckets ('
+                'key TEXT PRIMARY KEY, tokens REAL NOT NULL, '
+                'updated REAL NOT NULL, full_at REAL NOT NULL)'
+            )
+        return self._conn
+
+    async def take(self, key: str, bucket: Bucket, now: float) -> float:
+        return await asyncio.to_thread(self._take, key, bucket, now)
+
+    def _take(self, key: str, bucket: Bucket, now: float) -> float:
+        with self._lock:
+            self._connect()
+            # IMMEDIATE takes the write lock up front so concurrent
+            # workers cannot both spend the last token.
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(
+                    'SELECT tokens, updated FROM rate_limit_buckets '
+                    'WHERE key = ?',
+                    (key,),
+                ).fetchone()
+                tokens, updated = row or (bucket.capacity, now)
+                tokens = bucket.refill(tokens, now - updated)
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO rate_limit_buckets '
+                    'VALUES (?, ?, ?, ?)',
+                    (key, tokens, now, bucket.full_at(tokens, now)),
+                )
+
+                self._calls += 1
+                if self._calls % self.PRUNE_EVERY == 0:
+                    self._conn.execute(
+                        'DELETE FROM rate_limit_buckets WHERE full_at <= ?',
+                        (now,),
+                    )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+        return 0.0 if allowed else bucket.retry_after(tokens)
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute('DELETE FROM rate_limit_buckets')
+
+
+class LoginRateLimiter:
+    def __init__(self, backend, per_ip: Bucket, per_email: Bucket):
+        self.backend = backend
+        self.per_ip = per_ip
+        self.per_email = per_email
+        self.rejected = 0
+
+    async def check(self, ip: str, email: str):
+        now = time()
+
+        for key, bucket in [
+            (f'ip:{ip}', self.per_ip),
+            (f'email:{email.strip().lower()}', self.per_email),
+        ]:
+            retry_after = await self.backend.take(key, bucket, now)
+            if retry_after:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=HTTPStatus.TOO_MANY_REQUESTS,
+                    detail='Too many login attempts, try again later.',
+                    headers={'Retry-After': str(ceil(retry_after))},
+                )
+
+
+login_limiter = LoginRateLimiter(
+    backend=(
+        SQLiteBackend(settings.LOGIN_RATE_LIMIT_SQLITE_PATH)
+        if settings.LOGIN_RATE_LIMIT_BACKEND == 'sqlite'
+        else MemoryBackend()
+    ),
+    per_ip=Bucket.per_minute(
+        settings.LOGIN_RATE_LIMIT_IP_BURST,
+        settings.LOGIN_RATE_LIMIT_IP_PER_MINUTE,
+    ),
+    per_email=Bucket.per_minute(
+        settings.LOGIN_RATE_LIMIT_EMAIL_BURST,
+        settings.LOGIN_RATE_LIMIT_EMAIL_PER_MINUTE,
+    ),
+)
+
+
+async def limit_login(
+    request: Request,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+):
+    ip = request.client.host if request.client else 'unknown'
+    await login_limiter.check(ip, form_data.username)
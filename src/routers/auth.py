@@ -6,17 +6,27 @@ from sqlalchemy import select
 
 from src.database import T_Session
 from src.models import User
+from src.ratelimit import limit_login
 from src.schemas.token import Token
-from src.security import create_access_token, get_current_user, verify_password
+from src.security import (
+    create_access_token,
+    get_current_user,
+    hashing_pool,
+    verify_password,
+)
 
 router = APIRouter(prefix='/auth', tags=['auth'])
 
 
-@router.post('/token', response_model=Token)
-def login_for_access_token(
+@router.post(
+    '/token', response_model=Token, dependencies=[Depends(limit_login)]
+)
+async def login_for_access_token(
     session: T_Session, form_data: OAuth2PasswordRequestForm = Depends()
 ):
-    user = session.scalar(select(User).where(User.email == form_data.username))
+    user = await session.scalar(
+        select(User).where(User.email == form_data.username)
+    )
 
     if not user:
         raise HTTPException(
@@ -24,7 +34,9 @@ def login_for_access_token(
             detail='Incorrect email or password.',
         )
 
-    if not verify_password(form_data.password, user.password):
+    if not await hashing_pool.run(
+        verify_password, form_data.password, user.password
+    ):
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
             detail='Incorrect email or password.',
@@ -36,7 +48,7 @@ def login_for_access_token(
 
 
 @router.post('/refresh_token', response_model=Token)
-def refresh_access_token(user: User = Depends(get_current_user)):
+async def refresh_access_token(user: User = Depends(get_current_user)):
     new_access_token = create_access_token(data={'sub': user.email})
 
     return {'access_token': new_access_token, 'token_type': 'bearer'}
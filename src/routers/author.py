@@ -1,60 +1,168 @@
+from collections import defaultdict
 from http import HTTPStatus
+from typing import Annotated
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Header, Query, Response
 from fastapi.exceptions import HTTPException
-from sqlalchemy import select
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import T_Session
-from src.models import Author
-from src.schemas.authors import AuthorList, AuthorPublic, AuthorSchema
-from src.schemas.base import Message
+from src.batch import fetch_by_ids, parse_ids
+from src.cache import (
+    CachedResponse,
+    author_cache,
+    book_cache,
+    search_cache,
+)
+from src.database import (
+    T_ReadSession,
+    T_Session,
+    insert_or_ignore,
+    insert_returning,
+)
+from src.export import ExportFormat, export_response
+from src.models import Author, Book
+from src.pagination import next_cursor, paginate
+from src.schemas.authors import (
+    AuthorBatch,
+    AuthorList,
+    AuthorPublic,
+    AuthorSchema,
+    AuthorStats,
+    FilterAuthor,
+)
+from src.schemas.base import (
+    BatchGet,
+    FilterPage,
+    Message,
+    SuggestionList,
+)
+from src.schemas.books import BookList
+from src.search import text_search
 from src.security import CurrentUser
+from src.serializers import (
+    author_batch,
+    author_page,
+    book_page,
+    json_response,
+)
+from src.stats import author_stats
+from src.suggest import author_index, book_index, suggest
 
 router = APIRouter(prefix='/author', tags=['author'])
 
 
+async def _books_by_author(
+    session: AsyncSession, author_ids: list[int], limit: int
+) -> dict[int, list[dict]]:
+    """First `limit` books of each author, in one query for all authors."""
+    ranked = (
+        select(
+            Book.id,
+            Book.year,
+            Book.title,
+            Book.author_id,
+            func.row_number()
+            .over(partition_by=Book.author_id, order_by=Book.id)
+            .label('position'),
+        )
+        .where(Book.author_id.in_(author_ids))
+        .subquery()
+    )
+    query = (
+        select(ranked.c.id, ranked.c.year, ranked.c.title, ranked.c.author_id)
+        .where(ranked.c.position <= limit)
+        .order_by(ranked.c.author_id, ranked.c.id)
+    )
+
+    books = defaultdict(list)
+    for book in (await session.execute(query)).mappings():
+        books[book['author_id']].append(dict(book))
+
+    return books
+
+
 @router.post('/', response_model=AuthorPublic, status_code=HTTPStatus.CREATED)
-def add_author(author: AuthorSchema, session: T_Session, user: CurrentUser):
-    author_db = session.scalar(
-        select(Author).where(Author.name == author.name)
+async def add_author(
+    author: AuthorSchema, session: T_Session, user: CurrentUser
+):
+    statement = (
+        insert_or_ignore(session, Author)
+        .values(**author.model_dump())
+        .returning(Author.id, Author.name)
     )
+    author_db = await insert_returning(session, statement)
 
-    if author_db:
+    if not author_db:
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
             detail=f'{author.name} already in MADR.',
         )
 
-    author_db = Author(**author.model_dump())
+    author_index.add(author_db.id, author_db.name)
+    search_cache.bump('authors')
+
+    return author_db._asdict()
+
+
+async def _authors_by_ids(session: AsyncSession, ids: list[int]):
+    authors, missing = await fetch_by_ids(
+        session, select(Author.id, Author.name), Author.id, ids
+    )
+
+    return json_response(
+        author_batch, {'authors': authors, 'missing': missing}
+    )
 
-    session.add(author_db)
-    session.commit()
-    session.refresh(author_db)
 
-    return author_db
+@router.post('/batch-get', response_model=AuthorBatch)
+async def batch_get_authors(batch: BatchGet, session: T_ReadSession):
+    return await _authors_by_ids(session, batch.ids)
 
 
 @router.delete('/{author_id}', response_model=Message)
-def delete_author(author_id: int, session: T_Session, user: CurrentUser):
-    author_db = session.scalar(select(Author).where(Author.id == author_id))
+async def delete_author(author_id: int, session: T_Session, user: CurrentUser):
+    # The foreign key has no ON DELETE CASCADE, so the author's books go
+    # first, in the same transaction.
+    book_ids = (
+        await session.scalars(
+            delete(Book).where(Book.author_id == author_id).returning(Book.id)
+        )
+    ).all()
+    deleted = await session.scalar(
+        delete(Author).where(Author.id == author_id).returning(Author.id)
+    )
 
-    if not author_db:
+    if not deleted:
+        await session.rollback()
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail='Author not found in MADR.',
         )
 
-    session.delete(author_db)
-    session.commit()
+    await session.commit()
+    author_cache.pop(author_id)
+    author_index.remove(author_id)
+    for book_id in book_ids:
+        book_cache.pop(book_id)
+        book_index.remove(book_id)
+    search_cache.bump('authors', 'books')
 
     return {'message': 'Author deleted from MADR.'}
 
 
 @router.patch('/{author_id}', response_model=AuthorPublic)
-def update_author(
+async def update_author(
     author_id: int, author: AuthorSchema, session: T_Session, user: CurrentUser
 ):
-    author_db = session.scalar(select(Author).where(Author.id == author_id))
+    author_db = (
+        await session.execute(
+            update(Author)
+            .where(Author.id == author_id)
+            .values(name=author.name)
+            .returning(Author.id, Author.name)
+        )
+    ).first()
 
     if not author_db:
         raise HTTPException(
@@ -62,40 +170,152 @@ def update_author(
             detail='Author not found in MADR.',
         )
 
-    author_db.name = author.name
+    await session.commit()
+    author_cache.pop(author_id)
+    author_index.add(author_db.id, author_db.name)
+    search_cache.bump('authors')
+
+    return author_db._asdict()
+
 
-    session.add(author_db)
-    session.commit()
-    session.refresh(author_db)
+@router.get('/export')
+async def export_authors(session: T_Session, format: ExportFormat = 'ndjson'):
+    query = select(Author.id, Author.name).order_by(Author.id)
 
-    return author_db
+    return export_response(session, query, format, 'authors')
+
+
+@router.get('/suggest', response_model=SuggestionList)
+async def suggest_authors(
+    q: str,
+    session: T_ReadSession,
+    limit: Annotated[int, Query(gt=0, le=50)] = 10,
+):
+    return await suggest(author_index, session, q, limit)
 
 
 @router.get('/{author_id}', response_model=AuthorPublic)
-def get_author_by_id(author_id: int, session: T_Session):
-    author_db = session.scalar(select(Author).where(Author.id == author_id))
+async def get_author_by_id(
+    author_id: int,
+    session: T_ReadSession,
+    if_none_match: Annotated[str | None, Header()] = None,
+):
+    cached = author_cache.get(author_id)
 
-    if not author_db:
+    if cached is None:
+        version = author_cache.version(author_id)
+        author_db = await session.scalar(
+            select(Author).where(Author.id == author_id)
+        )
+
+        if not author_db:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND,
+                detail='Author not found in MADR.',
+            )
+
+        cached = CachedResponse.from_model(
+            AuthorPublic.model_validate(author_db, from_attributes=True)
+        )
+        author_cache.set(author_id, cached, version=version)
+
+    return cached.response(if_none_match)
+
+
+@router.get('/{author_id}/books', response_model=BookList)
+async def get_author_books(
+    author_id: int,
+    session: T_Session,
+    filters: Annotated[FilterPage, Depends()],
+):
+    query = paginate(
+        select(Book.id, Book.year, Book.title, Book.author_id).where(
+            Book.author_id == author_id
+        ),
+        Book.id,
+        filters,
+    )
+    books = (await session.execute(query)).all()
+
+    if not books and not await session.scalar(
+        select(Author.id).where(Author.id == author_id)
+    ):
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail='Author not found in MADR.',
         )
 
-    return author_db
+    return json_response(
+        book_page,
+        {
+            'books': [book._asdict() for book in books],
+            'next_cursor': next_cursor(books, filters),
+        },
+    )
 
 
-@router.get('/', response_model=AuthorList)
-def get_author_with_name_like(
-    session: T_Session,
-    name: str | None = None,
-    limit: int = 20,
-    offset: int = 0,
+@router.get('/{author_id}/stats', response_model=AuthorStats)
+async def get_author_stats(author_id: int, session: T_ReadSession):
+    stats = await author_stats(session, author_id)
+
+    if not stats['years'] and not await session.scalar(
+        select(Author.id).where(Author.id == author_id)
+    ):
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail='Author not found in MADR.',
+        )
+
+    return stats
+
+
+@router.get(
+    '/',
+    response_model=AuthorList | AuthorBatch,
+    response_model_exclude_unset=True,
+)
+async def get_author_with_name_like(
+    session: T_ReadSession, filters: Annotated[FilterAuthor, Depends()]
 ):
-    if not name:
-        return {'authors': []}
+    if filters.ids is not None:
+        return await _authors_by_ids(session, parse_ids(filters.ids))
+
+    if not filters.name:
+        return json_response(author_page, {'authors': [], 'next_cursor': None})
 
-    query = select(Author).filter(Author.name.contains(name))
+    tables = (
+        ('authors', 'books') if filters.include == 'books' else ('authors',)
+    )
+    key = search_cache.key(tables, filters)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return Response(cached, media_type='application/json')
 
-    authors_list = session.scalars(query.limit(limit).offset(offset)).all()
+    query, rank = text_search(
+        select(Author.id, Author.name),
+        Author.name,
+        filters.name,
+        session.bind.dialect.name,
+    )
+    query = paginate(query, Author.id, filters, rank)
+
+    authors_list = (await session.execute(query)).all()
+    authors = [author._asdict() for author in authors_list]
+
+    if filters.include == 'books':
+        books = await _books_by_author(
+            session, [a['id'] for a in authors], filters.books_limit
+        )
+        for author in authors:
+            author['books'] = books.get(author['id'], [])
+
+    response = json_response(
+        author_page,
+        {
+            'authors': authors,
+            'next_cursor': next_cursor(authors_list, filters),
+        },
+    )
+    search_cache.set(key, response.body)
 
-    return {'authors': authors_list}
+    return response
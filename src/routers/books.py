@@ -1,107 +1,244 @@
 from http import HTTPStatus
-
-from fastapi import APIRouter, HTTPException
-from sqlalchemy import select
-
-from src.database import T_Session
+from typing import Annotated
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from sqlalchemy import delete, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.batch import fetch_by_ids, parse_ids
+from src.cache import CachedResponse, book_cache, search_cache
+from src.database import (
+    T_ReadSession,
+    T_Session,
+    insert_or_ignore,
+    insert_returning,
+)
+from src.export import ExportFormat, export_response
+from src.ingest import ingest_books, iter_request_rows
 from src.models import Author, Book
-from src.schemas.base import Message
-from src.schemas.books import BookList, BookPublic, BookSchema, BookUpdate
+from src.pagination import next_cursor, paginate
+from src.schemas.base import BatchGet, Message, SuggestionList
+from src.schemas.books import (
+    BookBatch,
+    BookBulkResult,
+    BookList,
+    BookPublic,
+    BookSchema,
+    BookStats,
+    BookUpdate,
+    FilterBook,
+)
+from src.search import text_search
 from src.security import CurrentUser
+from src.serializers import book_batch, book_page, json_response
+from src.settings import Settings
+from src.stats import book_stats
+from src.suggest import book_index, suggest
 
 router = APIRouter(prefix='/book', tags=['book'])
+settings = Settings()
 
 
 @router.post('/', response_model=BookPublic, status_code=HTTPStatus.CREATED)
-def add_book(book: BookSchema, session: T_Session, user: CurrentUser):
-    db_book = session.scalar(select(Book).where(book.title == Book.title))
+async def add_book(book: BookSchema, session: T_Session, user: CurrentUser):
+    # Selecting the author id makes a missing author insert nothing, on
+    # every dialect, instead of relying on foreign key enforcement.
+    statement = (
+        insert_or_ignore(session, Book)
+        .from_select(
+            ['year', 'title', 'author_id'],
+            select(literal(book.year), literal(book.title), Author.id).where(
+                Author.id == book.author_id
+            ),
+        )
+        .returning(Book.id, Book.year, Book.title, Book.author_id)
+    )
+    db_book = await insert_returning(session, statement)
 
     if db_book:
+        book_index.add(db_book.id, db_book.title)
+        search_cache.bump('books')
+        return db_book._asdict()
+
+    if await session.scalar(select(Book.id).where(Book.title == book.title)):
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
-            detail=f'{db_book.title} already in MADR.',
+            detail=f'{book.title} already in MADR.',
         )
 
-    author = session.scalar(select(Author).where(Author.id == book.author_id))
+    raise HTTPException(
+        status_code=HTTPStatus.BAD_REQUEST,
+        detail=f'Author with ID {book.author_id} not found.',
+    )
 
-    if not author:
-        raise HTTPException(
-            status_code=HTTPStatus.BAD_REQUEST,
-            detail=f'Author with ID {book.author_id} not found.',
-        )
 
-    db_book = Book(**book.model_dump())
+async def _books_by_ids(session: AsyncSession, ids: list[int]):
+    books, missing = await fetch_by_ids(
+        session,
+        select(Book.id, Book.year, Book.title, Book.author_id),
+        Book.id,
+        ids,
+    )
+
+    return json_response(book_batch, {'books': books, 'missing': missing})
 
-    session.add(db_book)
-    session.commit()
-    session.refresh(db_book)
 
-    return db_book
+@router.post('/batch-get', response_model=BookBatch)
+async def batch_get_books(batch: BatchGet, session: T_ReadSession):
+    return await _books_by_ids(session, batch.ids)
+
+
+@router.post('/bulk', response_model=BookBulkResult)
+async def add_books_bulk(
+    request: Request, session: T_Session, user: CurrentUser
+):
+    # Batches commit one at a time, so even a failed upload may have
+    # written some of them.
+    try:
+        return await ingest_books(
+            session, iter_request_rows(request), settings.BULK_BATCH_SIZE
+        )
+    finally:
+        search_cache.bump('books')
 
 
 @router.delete('/{book_id}', response_model=Message)
-def delete_book(book_id: int, session: T_Session, user: CurrentUser):
-    db_book = session.scalar(select(Book).where(Book.id == book_id))
+async def delete_book(book_id: int, session: T_Session, user: CurrentUser):
+    deleted = await session.scalar(
+        delete(Book).where(Book.id == book_id).returning(Book.id)
+    )
 
-    if not db_book:
+    if not deleted:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail='Book not found in MADR.'
         )
 
-    session.delete(db_book)
-    session.commit()
+    await session.commit()
+    book_cache.pop(book_id)
+    book_index.remove(book_id)
+    search_cache.bump('books')
 
     return {'message': 'Book deleted from MADR.'}
 
 
 @router.patch('/{book_id}', response_model=BookPublic)
-def update_book(
+async def update_book(
     book_id: int, book: BookUpdate, session: T_Session, user: CurrentUser
 ):
-    db_book = session.scalar(select(Book).where(Book.id == book_id))
+    db_book = (
+        await session.execute(
+            update(Book)
+            .where(Book.id == book_id)
+            .values(year=book.year)
+            .returning(Book.id, Book.year, Book.title, Book.author_id)
+        )
+    ).first()
 
     if not db_book:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail='Book not found in MADR.'
         )
 
-    db_book.year = book.year
+    await session.commit()
+    book_cache.pop(book_id)
+    search_cache.bump('books')
+
+    return db_book._asdict()
 
-    session.add(db_book)
-    session.commit()
-    session.refresh(db_book)
 
-    return db_book
+@router.get('/export')
+async def export_books(session: T_Session, format: ExportFormat = 'ndjson'):
+    query = select(Book.id, Book.year, Book.title, Book.author_id).order_by(
+        Book.id
+    )
+
+    return export_response(session, query, format, 'books')
+
+
+@router.get('/suggest', response_model=SuggestionList)
+async def suggest_books(
+    q: str,
+    session: T_ReadSession,
+    limit: Annotated[int, Query(gt=0, le=50)] = 10,
+):
+    return await suggest(book_index, session, q, limit)
+
+
+@router.get('/stats', response_model=BookStats)
+async def get_book_stats(session: T_ReadSession):
+    return await book_stats(session)
 
 
 @router.get('/{book_id}', response_model=BookPublic)
-def get_book_by_id(book_id: int, session: T_Session):
-    db_book = session.scalar(select(Book).where(Book.id == book_id))
+async def get_book_by_id(
+    book_id: int,
+    session: T_ReadSession,
+    if_none_match: Annotated[str | None, Header()] = None,
+):
+    cached = book_cache.get(book_id)
 
-    if not db_book:
-        raise HTTPException(
-            status_code=HTTPStatus.NOT_FOUND, detail='Book not found in MADR.'
+    if cached is None:
+        version = book_cache.version(book_id)
+        db_book = await session.scalar(select(Book).where(Book.id == book_id))
+
+        if not db_book:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND,
+                detail='Book not found in MADR.',
+            )
+
+        cached = CachedResponse.from_model(
+            BookPublic.model_validate(db_book, from_attributes=True)
         )
+        book_cache.set(book_id, cached, version=version)
 
-    return db_book
+    return cached.response(if_none_match)
 
 
-@router.get('/', response_model=BookList)
-def get_book_like(
-    session: T_Session,
-    name: str | None = None,
-    year: int | None = None,
-    limit: int = 20,
-    offset: int = 0,
+@router.get('/', response_model=BookList | BookBatch)
+async def get_book_like(
+    session: T_ReadSession, filters: Annotated[FilterBook, Depends()]
 ):
-    query = select(Book)
+    if filters.ids is not None:
+        return await _books_by_ids(session, parse_ids(filters.ids))
+
+    # Keyed before querying: a write that lands meanwhile bumps the
+    # generation, so this page is stored under a key no one reads again.
+    key = search_cache.key(('books',), filters)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return Response(cached, media_type='application/json')
+
+    query = select(Book.id, Book.year, Book.title, Book.author_id)
+    rank = None
+
+    if filters.name:
+        query, rank = text_search(
+            query, Book.title, filters.name, session.bind.dialect.name
+        )
+
+    if filters.year:
+        query = query.filter(Book.year == filters.year)
 
-    if name:
-        query = query.filter(Book.title.contains(name))
+    query = paginate(query, Book.id, filters, rank)
 
-    if year:
-        query = query.filter(Book.year == year)
+    rows = (await session.execute(query)).all()
 
-    db_books = session.scalars(query.limit(limit).offset(offset)).all()
+    response = json_response(
+        book_page,
+        {
+            'books': [row._asdict() for row in rows],
+            'next_cursor': next_cursor(rows, filters),
+        },
+    )
+    search_cache.set(key, response.body)
 
-    return {'books': db_books}
+    return response
@@ -3,50 +3,52 @@ from http import HTTPStatus
 from fastapi import APIRouter, HTTPException
 from sqlalchemy import select
 
-from src.database import T_Session
+from src.database import T_Session, insert_or_ignore, insert_returning
 from src.models import User
 from src.schemas.base import Message
 from src.schemas.users import UserPublic, UserSchema
-from src.security import CurrentUser, get_password_hash
+from src.security import (
+    CurrentUser,
+    forget_user,
+    get_password_hash,
+    hashing_pool,
+)
 
 router = APIRouter(prefix='/users', tags=['users'])
 
 
 @router.post('/', response_model=UserPublic, status_code=HTTPStatus.CREATED)
-def create_user(user: UserSchema, session: T_Session):
-    user_db = session.scalar(
-        select(User).where(
-            (User.username == user.username) | (User.email == user.email)
+async def create_user(user: UserSchema, session: T_Session):
+    hashed_password = await hashing_pool.run(get_password_hash, user.password)
+
+    statement = (
+        insert_or_ignore(session, User)
+        .values(
+            username=user.username, email=user.email, password=hashed_password
         )
+        .returning(User.id, User.username, User.email)
     )
+    user_db = await insert_returning(session, statement)
 
     if user_db:
-        if user_db.username == user.username:
-            raise HTTPException(
-                status_code=HTTPStatus.BAD_REQUEST,
-                detail='Username already exists.',
-            )
-        if user_db.email == user.email:
-            raise HTTPException(
-                status_code=HTTPStatus.BAD_REQUEST,
-                detail='Email already exists.',
-            )
-
-    hashed_password = get_password_hash(user.password)
-
-    user_db = User(
-        username=user.username, email=user.email, password=hashed_password
-    )
+        return user_db._asdict()
 
-    session.add(user_db)
-    session.commit()
-    session.refresh(user_db)
+    if await session.scalar(
+        select(User.id).where(User.username == user.username)
+    ):
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail='Username already exists.',
+        )
 
-    return user_db
+    raise HTTPException(
+        status_code=HTTPStatus.BAD_REQUEST,
+        detail='Email already exists.',
+    )
 
 
 @router.put('/{user_id}', response_model=UserPublic)
-def update_user(
+async def update_user(
     user_id: int,
     user: UserSchema,
     session: T_Session,
@@ -57,20 +59,23 @@ def update_user(
             status_code=HTTPStatus.FORBIDDEN, detail='Not enough permissions.'
         )
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hashing_pool.run(get_password_hash, user.password)
+
+    previous_email = current_user.email
 
     current_user.username = user.username
     current_user.email = user.email
     current_user.password = hashed_password
 
-    session.commit()
-    session.refresh(current_user)
+    await session.commit()
+    forget_user(previous_email)
+    await session.refresh(current_user)
 
     return current_user
 
 
 @router.delete('/{user_id}', response_model=Message)
-def delete_user(
+async def delete_user(
     user_id: int,
     session: T_Session,
     current_user: CurrentUser,
@@ -80,7 +85,8 @@ def delete_user(
             status_code=HTTPStatus.FORBIDDEN, detail='Not enough permissions.'
         )
 
-    session.delete(current_user)
-    session.commit()
+    await session.delete(current_user)
+    await session.commit()
+    forget_user(current_user.email)
 
     return {'message': 'User Deleted.'}
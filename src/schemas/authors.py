@@ -1,20 +1,43 @@
-import re
+from typing import Literal
 
 from pydantic import BaseModel, field_validator
 
+from src.schemas.base import FilterPage, normalize_name
+from src.schemas.books import BookPublic, BookStats
+
 
 class AuthorSchema(BaseModel):
     name: str
 
     @field_validator('name')
     def validate_name(cls, v):
-        v = v.lower().strip()
-        return re.sub(r'\s+', ' ', v)
+        return normalize_name(v)
 
 
 class AuthorPublic(AuthorSchema):
     id: int
 
 
+class AuthorWithBooks(AuthorPublic):
+    books: list[BookPublic] | None = None
+
+
 class AuthorList(BaseModel):
+    authors: list[AuthorWithBooks]
+    next_cursor: str | None = None
+
+
+class AuthorBatch(BaseModel):
     authors: list[AuthorPublic]
+    missing: list[int]
+
+
+class AuthorStats(BookStats):
+    author_id: int
+
+
+class FilterAuthor(FilterPage):
+    name: str | None = None
+    ids: str | None = None
+    include: Literal['books'] | None = None
+    books_limit: int = 10
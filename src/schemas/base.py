@@ -1,5 +1,33 @@
+import re
+from typing import Literal
+
 from pydantic import BaseModel
 
 
+def normalize_name(value: str) -> str:
+    """Lowercase, trim and collapse inner whitespace, as names are stored."""
+    return re.sub(r'\s+', ' ', value.lower().strip())
+
+
 class Message(BaseModel):
     message: str
+
+
+class Suggestion(BaseModel):
+    id: int
+    name: str
+
+
+class SuggestionList(BaseModel):
+    suggestions: list[Suggestion]
+
+
+class BatchGet(BaseModel):
+    ids: list[int]
+
+
+class FilterPage(BaseModel):
+    limit: int = 20
+    offset: int = 0
+    cursor: str | None = None
+    sort: Literal['id', 'relevance'] = 'id'
@@ -1,7 +1,7 @@
-import re
-
 from pydantic import BaseModel, Field, field_validator
 
+from src.schemas.base import FilterPage, normalize_name
+
 
 class BookSchema(BaseModel):
     year: int = Field(gt=1700, lt=2025)
@@ -10,8 +10,7 @@ class BookSchema(BaseModel):
 
     @field_validator('title')
     def validate_name(cls, v):
-        v = v.lower().strip()
-        return re.sub(r'\s+', ' ', v)
+        return normalize_name(v)
 
 
 class BookPublic(BookSchema):
@@ -24,3 +23,35 @@ class BookUpdate(BaseModel):
 
 class BookList(BaseModel):
     books: list[BookPublic]
+    next_cursor: str | None = None
+
+
+class BookBatch(BaseModel):
+    books: list[BookPublic]
+    missing: list[int]
+
+
+class YearCount(BaseModel):
+    year: int
+    books: int
+
+
+class BookStats(BaseModel):
+    books: int
+    years: list[YearCount]
+
+
+class BookBulkError(BaseModel):
+    index: int
+    detail: str
+
+
+class BookBulkResult(BaseModel):
+    inserted: int
+    errors: list[BookBulkError]
+
+
+class FilterBook(FilterPage):
+    name: str | None = None
+    year: int | None = None
+    ids: str | None = None
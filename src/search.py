@@ -0,0 +1,39 @@
+from sqlalchemy import ColumnElement, Select, column, func, table
+
+MIN_TRIGRAM_LENGTH = 3
+
+
+def _fts_table(model_column: ColumnElement):
+    return table(
+        f'{model_column.table.name}_fts',
+        column('rowid'),
+        column(model_column.name),
+        column('rank'),
+    )
+
+
+def _phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def text_search(
+    query: Select, model_column: ColumnElement, term: str, dialect: str
+) -> tuple[Select, ColumnElement | None]:
+    """Filter `query` to rows whose column contains `term`.
+
+    Returns the filtered query and an expression to order by for
+    relevance (best match first), or None when the path has no ranking.
+    """
+    if dialect == 'postgresql':
+        # LIKE '%term%' is served by the gin_trgm_ops index.
+        rank = func.similarity(model_column, term).desc()
+        return query.filter(model_column.contains(term)), rank
+
+    if dialect == 'sqlite' and len(term) >= MIN_TRIGRAM_LENGTH:
+        fts = _fts_table(model_column)
+        query = query.join(fts, fts.c.rowid == model_column.table.c.id).filter(
+            fts.c[model_column.name].match(_phrase(term))
+        )
+        return query, fts.c.rank
+
+    return query.filter(model_column.contains(term)), None
@@ -1,5 +1,9 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from hashlib import blake2b
 from http import HTTPStatus
+from time import time
 from typing import Annotated
 
 from fastapi import Depends, HTTPException
@@ -7,8 +11,10 @@ from fastapi.security import OAuth2PasswordBearer
 from jwt import ExpiredSignatureError, PyJWTError, decode, encode
 from pwdlib import PasswordHash
 from sqlalchemy import select
+from sqlalchemy.orm import make_transient_to_detached
 from zoneinfo import ZoneInfo
 
+from src.cache import TTLCache
 from src.database import T_Session
 from src.models import User
 from src.settings import Settings
@@ -16,6 +22,51 @@ from src.settings import Settings
 pwd_context = PasswordHash.recommended()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/auth/token')
 settings = Settings()
+user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL
+)
+token_cache = TTLCache(
+    maxsize=settings.TOKEN_CACHE_SIZE,
+    ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
+
+
+class HashingPool:
+    """Runs Argon2 work on dedicated threads, away from the threadpool
+    and event loop that serve regular requests.
+
+    At most `workers + queue_size` jobs may be pending; beyond that
+    callers get a 503 immediately instead of queueing.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.limit = workers + queue_size
+        self.pending = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='argon2'
+        )
+
+    async def run(self, func, *args):
+        if self.pending >= self.limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                detail='Server busy, try again later.',
+                headers={'Retry-After': '1'},
+            )
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+
+hashing_pool = HashingPool(
+    workers=settings.HASHING_WORKERS, queue_size=settings.HASHING_QUEUE_SIZE
+)
 
 
 def get_password_hash(password: str):
@@ -26,6 +77,21 @@ def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def cache_user(user: User):
+    snapshot = User(
+        username=user.username, password=user.password, email=user.email
+    )
+    snapshot.id = user.id
+    snapshot.created_at = user.created_at
+    make_transient_to_detached(snapshot)
+
+    user_cache.set(user.email, snapshot)
+
+
+def forget_user(email: str):
+    user_cache.pop(email)
+
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(tz=ZoneInfo('UTC')) + timedelta(
@@ -40,7 +106,25 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 
-def get_current_user(session: T_Session, token: str = Depends(oauth2_scheme)):
+def decode_token(token: str) -> dict:
+    """Verify `token` and return its claims, cached until they expire."""
+    key = blake2b(token.encode(), digest_size=16).digest()
+
+    payload = token_cache.get(key)
+    if payload is not None and payload['exp'] > time():
+        return payload
+
+    payload = decode(token, settings.SECRET_KEY, algorithms=settings.ALGORITHM)
+
+    if 'exp' in payload:
+        token_cache.set(key, payload, ttl=payload['exp'] - time())
+
+    return payload
+
+
+async def get_current_user(
+    session: T_Session, token: str = Depends(oauth2_scheme)
+):
     credentials_exception = HTTPException(
         status_code=HTTPStatus.UNAUTHORIZED,
         detail='Could not validate credentials.',
@@ -48,9 +132,7 @@ def get_current_user(session: T_Session, token: str = Depends(oauth2_scheme)):
     )
 
     try:
-        payload = decode(
-            token, settings.SECRET_KEY, algorithms=settings.ALGORITHM
-        )
+        payload = decode_token(token)
         username = payload.get('sub')
         if not username:
             raise credentials_exception
@@ -59,11 +141,17 @@ def get_current_user(session: T_Session, token: str = Depends(oauth2_scheme)):
     except PyJWTError:
         raise credentials_exception
 
-    user_db = session.scalar(select(User).where(User.email == username))
+    cached_user = user_cache.get(username)
+    if cached_user is not None:
+        return await session.merge(cached_user, load=False)
+
+    user_db = await session.scalar(select(User).where(User.email == username))
 
     if not user_db:
         raise credentials_exception
 
+    cache_user(user_db)
+
     return user_db
 
 
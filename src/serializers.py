@@ -0,0 +1,49 @@
+from typing import NotRequired, TypedDict
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+
+class BookRow(TypedDict):
+    id: int
+    year: int
+    title: str
+    author_id: int
+
+
+class BookPage(TypedDict):
+    books: list[BookRow]
+    next_cursor: str | None
+
+
+class BookBatch(TypedDict):
+    books: list[BookRow]
+    missing: list[int]
+
+
+class AuthorRow(TypedDict):
+    id: int
+    name: str
+    books: NotRequired[list[BookRow]]
+
+
+class AuthorPage(TypedDict):
+    authors: list[AuthorRow]
+    next_cursor: str | None
+
+
+class AuthorBatch(TypedDict):
+    authors: list[AuthorRow]
+    missing: list[int]
+
+
+# Rows come straight from the database, so these adapters only serialize:
+# no ORM instances are built and nothing is validated a second time.
+book_page = TypeAdapter(BookPage)
+author_page = TypeAdapter(AuthorPage)
+book_batch = TypeAdapter(BookBatch)
+author_batch = TypeAdapter(AuthorBatch)
+
+
+def json_response(adapter: TypeAdapter, payload) -> Response:
+    return Response(adapter.dump_json(payload), media_type='application/json')
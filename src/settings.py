@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -6,7 +8,56 @@ class Settings(BaseSettings):
         env_file='.env', env_file_encoding='utf-8'
     )
 
-    DATABASE_URL: str = 'sqlite:///database.db'
+    DATABASE_URL: str = 'sqlite+aiosqlite:///database.db'
     SECRET_KEY: str = 'your-secret-key'
     ALGORITHM: str = 'HS256'
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+
+    SERVER_WORKERS: int = 0
+    SERVER_PRELOAD: bool = True
+    SERVER_MAX_REQUESTS: int = 10_000
+    SERVER_MAX_REQUESTS_JITTER: int = 1_000
+    SERVER_WARMUP: bool = False
+
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: float = 30.0
+    DATABASE_POOL_RECYCLE: int = -1
+    DATABASE_POOL_PRE_PING: bool = False
+
+    READ_DATABASE_URLS: str = ''
+    READ_REPLICA_EJECT_SECONDS: float = 30.0
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+
+    USER_CACHE_SIZE: int = 1024
+    USER_CACHE_TTL: float = 30.0
+    TOKEN_CACHE_SIZE: int = 4096
+
+    HASHING_WORKERS: int = 2
+    HASHING_QUEUE_SIZE: int = 32
+
+    LOGIN_RATE_LIMIT_BACKEND: Literal['memory', 'sqlite'] = 'memory'
+    LOGIN_RATE_LIMIT_SQLITE_PATH: str = 'ratelimit.db'
+    LOGIN_RATE_LIMIT_IP_BURST: int = 20
+    LOGIN_RATE_LIMIT_IP_PER_MINUTE: float = 10.0
+    LOGIN_RATE_LIMIT_EMAIL_BURST: int = 5
+    LOGIN_RATE_LIMIT_EMAIL_PER_MINUTE: float = 2.0
+
+    BULK_BATCH_SIZE: int = 1000
+
+    EXPORT_CHUNK_SIZE: int = 1000
+
+    BATCH_GET_MAX_IDS: int = 100
+
+    SUGGEST_REFRESH_SECONDS: float = 60.0
+
+    ENTITY_CACHE_SIZE: int = 10_000
+    ENTITY_CACHE_TTL: float = 60.0
+    SEARCH_CACHE_SIZE: int = 1_000
+    SEARCH_CACHE_TTL: float = 10.0
+    SEARCH_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    SEARCH_CACHE_MAX_ENTRY_BYTES: int = 256 * 1024
+
+    SLOW_QUERY_LOG: bool = False
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_LOG_INTERVAL: float = 60.0
@@ -0,0 +1,116 @@
+import logging
+from contextvars import ContextVar
+from time import monotonic, perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger('madr.slow_query')
+
+EXPLAINABLE = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH'}
+MAX_TRACKED_STATEMENTS = 1024
+SAVEPOINT = 'slow_query_explain'
+
+# ASGI scope of the request being served, set by the metrics middleware.
+current_request: ContextVar[dict | None] = ContextVar(
+    'current_request', default=None
+)
+
+
+def redact(parameters):
+    if isinstance(parameters, dict):
+        return {
+            key: f'<{type(value).__name__}>'
+            for key, value in parameters.items()
+        }
+    if isinstance(parameters, (list, tuple)):
+        return [f'<{type(value).__name__}>' for value in parameters]
+    return parameters
+
+
+def current_route() -> str | None:
+    scope = current_request.get()
+    if scope is None:
+        return None
+
+    route = scope.get('route')
+    return f'{scope["method"]} {route.path if route else scope["path"]}'
+
+
+def explain(dbapi_connection, dialect: str, statement: str, parameters):
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect == 'sqlite' else 'EXPLAIN '
+    # EXPLAIN runs inside the request's transaction. On PostgreSQL a failed
+    # statement (a timeout, a cancel) aborts that transaction, so it is
+    # fenced with a savepoint; SQLite errors leave the transaction usable.
+    fenced = dialect != 'sqlite'
+    cursor = dbapi_connection.cursor()
+    try:
+        if fenced:
+            cursor.execute(f'SAVEPOINT {SAVEPOINT}')
+        try:
+            cursor.execute(prefix + statement, parameters)
+            plan = [
+                ' '.join(str(column) for column in row)
+                for row in cursor.fetchall()
+            ]
+        except Exception:
+            if fenced:
+                cursor.execute(f'ROLLBACK TO SAVEPOINT {SAVEPOINT}')
+            raise
+        if fenced:
+            cursor.execute(f'RELEASE SAVEPOINT {SAVEPOINT}')
+        return plan
+    except Exception as error:  # noqa: BLE001
+        return [f'EXPLAIN failed: {error}']
+    finally:
+        cursor.close()
+
+
+def install_slow_query_log(
+    engine: AsyncEngine, threshold_ms: float, interval: float
+):
+    """Log statements slower than `threshold_ms` with their query plan.
+
+    Each distinct statement is logged at most once every `interval`
+    seconds so the log is safe to leave enabled.
+    """
+    sync_engine = engine.sync_engine
+    last_logged: dict[str, float] = {}
+
+    @event.listens_for(sync_engine, 'before_cursor_execute', named=True)
+    def before_cursor_execute(conn, **kw):
+        conn.info.setdefault('slow_query_start', []).append(perf_counter())
+
+    @event.listens_for(sync_engine, 'after_cursor_execute', named=True)
+    def after_cursor_execute(conn, statement, parameters, executemany, **kw):
+        elapsed_ms = (
+            perf_counter() - conn.info['slow_query_start'].pop()
+        ) * 1000
+        if elapsed_ms < threshold_ms:
+            return
+
+        now = monotonic()
+        if now - last_logged.get(statement, -interval) < interval:
+            return
+        if len(last_logged) >= MAX_TRACKED_STATEMENTS:
+            last_logged.clear()
+        last_logged[statement] = now
+
+        operation = statement.lstrip().split(None, 1)[0].upper()
+        plan = []
+        if operation in EXPLAINABLE and not executemany:
+            plan = explain(
+                conn.connection.dbapi_connection,
+                sync_engine.dialect.name,
+                statement,
+                parameters,
+            )
+
+        logger.warning(
+            'slow query (%.1f ms) route=%s\n%s\nparameters: %s\nplan:\n  %s',
+            elapsed_ms,
+            current_route(),
+            statement,
+            redact(parameters),
+            '\n  '.join(plan),
+        )
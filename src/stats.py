@@ -0,0 +1,69 @@
+"""Catalog statistics kept in the `book_year_stats` and `author_year_stats`
+summary tables, which triggers on `books` update on every write.
+
+Rebuild them from the books table (e.g. after restoring a dump) with:
+
+    python -m src.stats
+"""
+
+import asyncio
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database import engine
+from src.models import AuthorYearStats, Book, BookYearStats
+
+
+def _histogram(rows) -> dict:
+    years = [{'year': year, 'books': books} for year, books in rows]
+    return {'books': sum(row['books'] for row in years), 'years': years}
+
+
+async def book_stats(session: AsyncSession) -> dict:
+    rows = await session.execute(
+        select(BookYearStats.year, BookYearStats.books)
+        .where(BookYearStats.books > 0)
+        .order_by(BookYearStats.year)
+    )
+    return _histogram(rows)
+
+
+async def author_stats(session: AsyncSession, author_id: int) -> dict:
+    rows = await session.execute(
+        select(AuthorYearStats.year, AuthorYearStats.books)
+        .where(AuthorYearStats.author_id == author_id)
+        .where(AuthorYearStats.books > 0)
+        .order_by(AuthorYearStats.year)
+    )
+    return {'author_id': author_id, **_histogram(rows)}
+
+
+async def rebuild_stats(session: AsyncSession):
+    await session.execute(delete(BookYearStats))
+    await session.execute(delete(AuthorYearStats))
+    await session.execute(
+        insert(BookYearStats).from_select(
+            ['year', 'books'],
+            select(Book.year, func.count()).group_by(Book.year),
+        )
+    )
+    await session.execute(
+        insert(AuthorYearStats).from_select(
+            ['author_id', 'year', 'books'],
+            select(Book.author_id, Book.year, func.count()).group_by(
+                Book.author_id, Book.year
+            ),
+        )
+    )
+    await session.commit()
+
+
+async def main():  # pragma: no cover
+    async with AsyncSession(engine) as session:
+        await rebuild_stats(session)
+    await engine.dispose()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    asyncio.run(main())
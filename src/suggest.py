@@ -0,0 +1,125 @@
+import asyncio
+from bisect import bisect_left, insort
+from time import monotonic
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import Author, Book
+from src.schemas.base import normalize_name
+from src.settings import Settings
+
+settings = Settings()
+
+
+class PrefixIndex:
+    """Sorted `(name, id)` pairs answering prefix queries with bisect.
+
+    The write handlers keep it in step with their own changes; a full
+    rebuild every `SUGGEST_REFRESH_SECONDS` picks up writes made by other
+    workers. Only one rebuild runs at a time, and requests keep searching
+    the previous entries while it loads.
+    """
+
+    def __init__(self, column):
+        self.column = column
+        self.built_at: float | None = None
+        self._entries: list[tuple[str, int]] = []
+        self._names: dict[int, str] = {}
+        # Set while a rebuild is loading: the changes made meanwhile, to
+        # replay on top of rows read before they were committed.
+        self._pending: list[tuple[int, str | None]] | None = None
+        self._loading: asyncio.Future | None = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def rebuild(self, rows):
+        self._names = {id: name for id, name in rows}
+        self._entries = sorted((name, id) for id, name in self._names.items())
+        for id, name in self._pending or []:
+            self._remove(id)
+            if name is not None:
+                self._insert(id, name)
+        self.built_at = monotonic()
+
+    def add(self, id: int, name: str):
+        if self._pending is not None:
+            self._pending.append((id, name))
+        if self.built_at is None:
+            return
+        self._remove(id)
+        self._insert(id, name)
+
+    def remove(self, id: int):
+        if self._pending is not None:
+            self._pending.append((id, None))
+        self._remove(id)
+
+    def _insert(self, id: int, name: str):
+        self._names[id] = name
+        insort(self._entries, (name, id))
+
+    def _remove(self, id: int):
+        name = self._names.pop(id, None)
+        if name is None:
+            return
+        position = bisect_left(self._entries, (name, id))
+        del self._entries[position]
+
+    def clear(self):
+        self.built_at = None
+        self._entries = []
+        self._names = {}
+        self._pending = None
+        self._loading = None
+
+    def search(self, prefix: str, limit: int) -> list[tuple[str, int]]:
+        start = bisect_left(self._entries, (prefix,))
+        matches = []
+        for name, id in self._entries[start : start + limit]:
+            if not name.startswith(prefix):
+                break
+            matches.append((name, id))
+        return matches
+
+    async def refresh(self, session: AsyncSession):
+        """Reload from the database when never built or out of date.
+
+        While another request is reloading, return at once with the old
+        entries; before the first build there are none, so wait for it.
+        """
+        if (
+            self.built_at is not None
+            and monotonic() - self.built_at <= settings.SUGGEST_REFRESH_SECONDS
+        ):
+            return
+
+        if self._loading is not None:
+            if self.built_at is None:
+                await asyncio.shield(self._loading)
+            return
+
+        loading = self._loading = asyncio.get_running_loop().create_future()
+        self._pending = []
+        try:
+            table = self.column.class_
+            rows = await session.execute(select(table.id, self.column))
+            self.rebuild(rows)
+        finally:
+            self._pending = None
+            self._loading = None
+            loading.set_result(None)
+
+
+book_index = PrefixIndex(Book.title)
+author_index = PrefixIndex(Author.name)
+
+
+async def suggest(
+    index: PrefixIndex, session: AsyncSession, q: str, limit: int
+) -> dict:
+    await index.refresh(session)
+    matches = index.search(normalize_name(q), limit)
+
+    return {'suggestions': [{'id': id, 'name': name} for name, id in matches]}
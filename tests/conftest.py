@@ -1,15 +1,18 @@
 import factory
 import factory.fuzzy
 import pytest
+import pytest_asyncio
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from testcontainers.postgres import PostgresContainer
 
 from src.app import app
-from src.database import get_session
+from src.cache import author_cache, book_cache, search_cache
+from src.database import get_read_session, get_session
 from src.models import Author, Book, User, table_registry
-from src.security import get_password_hash
+from src.ratelimit import login_limiter
+from src.security import get_password_hash, token_cache, user_cache
+from src.suggest import author_index, book_index
 
 
 class UserFactory(factory.Factory):
@@ -37,24 +40,40 @@ class AuthorFactory(factory.Factory):
     name = factory.Sequence(lambda n: f'author_{n}')
 
 
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    yield
+    user_cache.clear()
+    token_cache.clear()
+    book_cache.clear()
+    author_cache.clear()
+    search_cache.clear()
+    login_limiter.backend.clear()
+    book_index.clear()
+    author_index.clear()
+
+
 @pytest.fixture(scope='session')
 def engine():
     with PostgresContainer('postgres:16', driver='psycopg') as postgres:
-        _engine = create_engine(postgres.get_connection_url())
+        _engine = create_async_engine(postgres.get_connection_url())
 
-        with _engine.begin():
-            yield _engine
+        yield _engine
 
 
-@pytest.fixture
-def session(engine):
-    table_registry.metadata.create_all(engine)
+@pytest_asyncio.fixture
+async def session(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(table_registry.metadata.create_all)
 
-    with Session(engine) as session:
+    async with AsyncSession(engine, expire_on_commit=False) as session:
         yield session
-        session.rollback()
+        await session.rollback()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(table_registry.metadata.drop_all)
 
-    table_registry.metadata.drop_all(engine)
+    await engine.dispose()
 
 
 @pytest.fixture
@@ -64,6 +83,7 @@ def client(session):
 
     with TestClient(app) as client:
         app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
         yield client
 
     app.dependency_overrides.clear()
@@ -78,49 +98,49 @@ def token(client, user):
     return response.json()['access_token']
 
 
-@pytest.fixture
-def user(session):
+@pytest_asyncio.fixture
+async def user(session):
     pwd = 'testest'
 
     user = UserFactory(password=get_password_hash(pwd))
 
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
 
     user.clean_password = pwd  # Monkey Patch
 
     return user
 
 
-@pytest.fixture
-def other_user(session):
+@pytest_asyncio.fixture
+async def other_user(session):
     user = UserFactory()
 
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
 
     return user
 
 
-@pytest.fixture
-def author(session):
+@pytest_asyncio.fixture
+async def author(session):
     author = AuthorFactory()
 
     session.add(author)
-    session.commit()
-    session.refresh(author)
+    await session.commit()
+    await session.refresh(author)
 
     return author
 
 
-@pytest.fixture
-def book(session, author):
+@pytest_asyncio.fixture
+async def book(session, author):
     book = BookFactory()
 
     session.add(book)
-    session.commit()
-    session.refresh(book)
+    await session.commit()
+    await session.refresh(book)
 
     return book
@@ -1,8 +1,66 @@
 from http import HTTPStatus
 
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.app import app, warmup
+from src.database import InstrumentedQueuePool, ReplicaSet
+from src.models import Author, table_registry
+from src.suggest import author_index
+
 
 def test_read_home_root(client):
     response = client.get('/')
 
     assert response.status_code == HTTPStatus.OK
     assert response.json() == {'message': 'Root Endpoint!'}
+
+
+def test_metrics_records_routes_and_queries(client, author):
+    client.get(f'/author/{author.id}')
+
+    response = client.get('/metrics')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'].startswith('text/plain')
+    assert (
+        'madr_http_responses_total{method="GET",route="/author/{author_id}",'
+        'status="200"}'
+    ) in response.text
+    assert (
+        'madr_db_queries_per_request_count'
+        '{method="GET",route="/author/{author_id}"}'
+    ) in response.text
+    assert 'madr_db_query_duration_seconds_count{operation="SELECT"}' in (
+        response.text
+    )
+    assert 'madr_db_pool_checkouts_total{engine="primary"}' in response.text
+
+
+@pytest.mark.asyncio
+async def test_warmup_opens_pools_and_ejects_unreachable_replica(tmp_path):
+    pool_size = 3
+    engine = create_async_engine(
+        f'sqlite+aiosqlite:///{tmp_path}/warmup.db',
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(table_registry.metadata.create_all)
+        await conn.execute(insert(Author).values(name='warm author'))
+    unreachable = create_async_engine(
+        f'sqlite+aiosqlite:///{tmp_path}/missing/replica.db'
+    )
+    replica_set = ReplicaSet(engine, [unreachable], 30, 0)
+    app.openapi_schema = None
+
+    await warmup(app, replica_set, pool_size)
+
+    assert engine.sync_engine.pool.checkedin() == pool_size
+    assert replica_set.choose() is engine
+    assert app.openapi_schema is not None
+    assert author_index.search('warm', limit=1) == [('warm author', 1)]
+
+    await engine.dispose()
+    await unreachable.dispose()
@@ -1,7 +1,10 @@
 from http import HTTPStatus
 
+import pytest
 from freezegun import freeze_time
 
+from src.ratelimit import Bucket, MemoryBackend, SQLiteBackend, login_limiter
+
 
 def test_get_token(client, user):
     response = client.post(
@@ -107,3 +110,36 @@ def test_user_not_found_get_current_user(client, user, token):
 
     assert response.status_code == HTTPStatus.UNAUTHORIZED
     assert response.json() == {'detail': 'Could not validate credentials.'}
+
+
+def test_token_rate_limited_by_email(client, user, monkeypatch):
+    monkeypatch.setattr(login_limiter, 'per_email', Bucket.per_minute(1, 1))
+    data = {'username': user.email, 'password': 'wrong'}
+
+    first = client.post('/auth/token', data=data)
+    second = client.post('/auth/token', data=data)
+
+    assert first.status_code == HTTPStatus.BAD_REQUEST
+    assert second.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert second.headers['Retry-After'] == '60'
+    assert second.json() == {
+        'detail': 'Too many login attempts, try again later.'
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('backend_name', ['memory', 'sqlite'])
+async def test_rate_limit_backends_refill(backend_name, tmp_path):
+    backend = (
+        SQLiteBackend(str(tmp_path / 'ratelimit.db'))
+        if backend_name == 'sqlite'
+        else MemoryBackend()
+    )
+    bucket = Bucket(capacity=2, rate=1)
+    expected_retry_after = 0.5
+
+    assert await backend.take('key', bucket, now=0) == 0
+    assert await backend.take('key', bucket, now=0) == 0
+    assert await backend.take('key', bucket, now=0) == 1
+    assert await backend.take('key', bucket, now=0.5) == (expected_retry_after)
+    assert await backend.take('key', bucket, now=2) == 0
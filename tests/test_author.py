@@ -1,6 +1,9 @@
 from http import HTTPStatus
 
-from tests.conftest import AuthorFactory
+import pytest
+
+from src.cache import search_cache
+from tests.conftest import AuthorFactory, BookFactory
 
 
 def test_add_author(client, token):
@@ -56,6 +59,16 @@ def test_delete_author(client, token, author):
     assert response.json() == {'message': 'Author deleted from MADR.'}
 
 
+def test_delete_author_removes_its_books(client, token, author, book):
+    response = client.delete(
+        f'/author/{author.id}',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert client.get(f'/book/{book.id}').status_code == HTTPStatus.NOT_FOUND
+
+
 def test_delete_author_not_found(client, token, author):
     response = client.delete(
         '/author/555',
@@ -120,42 +133,243 @@ def test_get_author_by_id_not_found(client, author):
     assert response.json() == {'detail': 'Author not found in MADR.'}
 
 
-def test_list_authors_filter_name_should_return_5_authors(client, session):
+@pytest.mark.asyncio
+async def test_list_authors_filter_name_should_return_5_authors(
+    client, session
+):
     expected_authors = 5
-    session.bulk_save_objects(AuthorFactory.create_batch(5))
+    session.add_all(AuthorFactory.create_batch(5))
     author_with_name = AuthorFactory.create_batch(5, name='name')
     for n, book in enumerate(author_with_name):
         book.title = f'name_{n}'
-    session.commit()
+    await session.commit()
 
     response = client.get('/author/?name=author')
 
     assert len(response.json()['authors']) == expected_authors
 
 
-def test_list_authors_filter_name_should_return_empty(client, session):
-    session.bulk_save_objects(AuthorFactory.create_batch(5))
-    session.commit()
+@pytest.mark.asyncio
+async def test_list_authors_filter_name_should_return_empty(client, session):
+    session.add_all(AuthorFactory.create_batch(5))
+    await session.commit()
 
     response = client.get('/author/?name=different name')
 
     assert response.json()['authors'] == []
 
 
-def test_list_authors_filter_name_empty(client, session):
-    session.bulk_save_objects(AuthorFactory.create_batch(5))
-    session.commit()
+@pytest.mark.asyncio
+async def test_list_authors_filter_name_empty(client, session):
+    session.add_all(AuthorFactory.create_batch(5))
+    await session.commit()
 
     response = client.get('/author/?name=')
 
     assert response.json()['authors'] == []
 
 
-def test_list_authors_pagination_should_return_20_authors(session, client):
+@pytest.mark.asyncio
+async def test_list_authors_pagination_should_return_20_authors(
+    session, client
+):
     expected_books = 20
-    session.bulk_save_objects(AuthorFactory.create_batch(25))
-    session.commit()
+    session.add_all(AuthorFactory.create_batch(25))
+    await session.commit()
 
     response = client.get('/author/?name=author')
 
     assert len(response.json()['authors']) == expected_books
+
+
+@pytest.mark.asyncio
+async def test_list_authors_cursor_pagination(session, client):
+    session.add_all(AuthorFactory.create_batch(5))
+    await session.commit()
+
+    response = client.get('/author/?name=author&limit=3')
+    first_page = response.json()
+
+    response = client.get(
+        f'/author/?name=author&limit=3&cursor={first_page["next_cursor"]}'
+    )
+    second_page = response.json()
+
+    ids = [a['id'] for a in first_page['authors'] + second_page['authors']]
+    assert ids == [1, 2, 3, 4, 5]
+    assert second_page['next_cursor'] is None
+
+
+@pytest.mark.asyncio
+async def test_list_authors_search_after_update(session, client, token):
+    session.add(AuthorFactory(name='frank herbert'))
+    await session.commit()
+
+    client.patch(
+        '/author/1',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'name': 'brian herbert'},
+    )
+
+    response = client.get('/author/?name=frank')
+    assert response.json()['authors'] == []
+
+    response = client.get('/author/?name=brian')
+    assert response.json()['authors'] == [{'id': 1, 'name': 'brian herbert'}]
+
+
+def test_export_authors_csv(client, author):
+    response = client.get('/author/export?format=csv')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.text.splitlines() == [
+        'id,name',
+        f'{author.id},{author.name}',
+    ]
+
+
+def test_get_author_by_id_cache_invalidated_on_delete(client, token, author):
+    assert client.get(f'/author/{author.id}').status_code == HTTPStatus.OK
+
+    client.delete(
+        f'/author/{author.id}', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    response = client.get(f'/author/{author.id}')
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_list_authors_include_books(session, client):
+    authors = AuthorFactory.create_batch(2)
+    session.add_all(authors)
+    await session.commit()
+    session.add_all(BookFactory.create_batch(3, author_id=1, year=2000))
+    await session.commit()
+
+    response = client.get('/author/?name=author&include=books&books_limit=2')
+
+    first, second = response.json()['authors']
+    assert [book['author_id'] for book in first['books']] == [1, 1]
+    assert second['books'] == []
+
+
+def test_list_authors_without_include_has_no_books(client, author):
+    response = client.get('/author/?name=author')
+
+    assert response.json()['authors'] == [
+        {'id': author.id, 'name': author.name}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_author_books_paginated(session, client, author):
+    expected_books = 2
+    session.add_all(BookFactory.create_batch(3, year=2000))
+    await session.commit()
+
+    response = client.get(f'/author/{author.id}/books?limit=2')
+
+    assert len(response.json()['books']) == expected_books
+    assert response.json()['next_cursor']
+
+
+def test_get_author_books_author_not_found(client):
+    response = client.get('/author/555/books')
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json() == {'detail': 'Author not found in MADR.'}
+
+
+@pytest.mark.asyncio
+async def test_get_author_stats(session, client, author):
+    session.add_all([
+        *BookFactory.create_batch(2, year=2000),
+        BookFactory(year=2001),
+    ])
+    await session.commit()
+
+    response = client.get(f'/author/{author.id}/stats')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'author_id': author.id,
+        'books': 3,
+        'years': [{'year': 2000, 'books': 2}, {'year': 2001, 'books': 1}],
+    }
+
+
+def test_get_author_stats_without_books(client, author):
+    response = client.get(f'/author/{author.id}/stats')
+
+    assert response.json() == {'author_id': author.id, 'books': 0, 'years': []}
+
+
+def test_get_author_stats_not_found(client):
+    response = client.get('/author/555/stats')
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json() == {'detail': 'Author not found in MADR.'}
+
+
+def test_get_authors_by_ids(client, author):
+    response = client.get(f'/author/?ids=7,{author.id}')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'authors': [{'id': author.id, 'name': author.name}],
+        'missing': [7],
+    }
+
+
+def test_batch_get_authors(client, author):
+    response = client.post('/author/batch-get', json={'ids': [author.id]})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'authors': [{'id': author.id, 'name': author.name}],
+        'missing': [],
+    }
+
+
+def test_suggest_authors_follows_rename(client, token, author):
+    old_name = author.name
+    client.get('/author/suggest?q=x')
+
+    client.patch(
+        f'/author/{author.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'name': 'machado de assis'},
+    )
+
+    assert client.get('/author/suggest?q=mach').json() == {
+        'suggestions': [{'id': author.id, 'name': 'machado de assis'}]
+    }
+    assert client.get(f'/author/suggest?q={old_name}').json() == {
+        'suggestions': []
+    }
+
+
+@pytest.mark.asyncio
+async def test_list_authors_cache_follows_book_deletes(
+    session, client, token, author
+):
+    expected_books = 2
+    books = BookFactory.create_batch(expected_books, author_id=author.id)
+    session.add_all(books)
+    await session.commit()
+    url = f'/author/?name={author.name}&include=books'
+    client.get(url)
+    hits = search_cache.hits
+
+    response = client.get(url)
+    assert search_cache.hits == hits + 1
+    assert len(response.json()['authors'][0]['books']) == expected_books
+
+    client.delete(
+        f'/book/{books[0].id}', headers={'Authorization': f'Bearer {token}'}
+    )
+    response = client.get(url)
+
+    assert search_cache.hits == hits + 1
+    assert len(response.json()['authors'][0]['books']) == expected_books - 1
@@ -1,5 +1,16 @@
+import asyncio
+import json
 from http import HTTPStatus
 
+import pytest
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+
+from src.batch import settings
+from src.cache import SearchCache, book_cache, search_cache
+from src.models import Book, BookYearStats
+from src.stats import rebuild_stats
+from src.suggest import PrefixIndex
 from tests.conftest import BookFactory
 
 
@@ -98,12 +109,13 @@ def test_delete_book_not_authenticated(client, book):
     assert response.json() == {'detail': 'Not authenticated'}
 
 
-def test_patch_book(session, client, token, author):
+@pytest.mark.asyncio
+async def test_patch_book(session, client, token, author):
     input_year = 2000
     book = BookFactory(year=input_year)
 
     session.add(book)
-    session.commit()
+    await session.commit()
 
     year_expected = 2024
 
@@ -167,69 +179,533 @@ def test_list_books_empty(client):
     assert response.json()['books'] == []
 
 
-def test_list_books_filter_name_should_return_5_books(client, session, author):
+@pytest.mark.asyncio
+async def test_list_books_filter_name_should_return_5_books(
+    client, session, author
+):
     expected_books = 5
-    session.bulk_save_objects(BookFactory.create_batch(5))
+    session.add_all(BookFactory.create_batch(5))
     books_with_title = BookFactory.create_batch(5, title='title')
     for n, book in enumerate(books_with_title):
         book.title = f'title_{n}'
-    session.bulk_save_objects(books_with_title)
-    session.commit()
+    session.add_all(books_with_title)
+    await session.commit()
 
     response = client.get('/book/?name=oo')
 
     assert len(response.json()['books']) == expected_books
 
 
-def test_list_books_filter_name_should_return_empty(client, session, author):
-    session.bulk_save_objects(BookFactory.create_batch(5))
-    session.commit()
+@pytest.mark.asyncio
+async def test_list_books_filter_name_should_return_empty(
+    client, session, author
+):
+    session.add_all(BookFactory.create_batch(5))
+    await session.commit()
 
     response = client.get('/book/?name=title')
 
     assert response.json()['books'] == []
 
 
-def test_list_books_filter_year_should_return_5_books(client, session, author):
+@pytest.mark.asyncio
+async def test_list_books_filter_year_should_return_5_books(
+    client, session, author
+):
     expected_books = 5
-    session.bulk_save_objects(BookFactory.create_batch(5, year=2000))
-    session.bulk_save_objects(BookFactory.create_batch(5, year=2024))
-    session.commit()
+    session.add_all(BookFactory.create_batch(5, year=2000))
+    session.add_all(BookFactory.create_batch(5, year=2024))
+    await session.commit()
 
     response = client.get('/book/?year=2000')
 
     assert len(response.json()['books']) == expected_books
 
 
-def test_list_books_filter_year_should_return_empty(client, session, author):
-    session.bulk_save_objects(BookFactory.create_batch(5, year=2000))
-    session.commit()
+@pytest.mark.asyncio
+async def test_list_books_filter_year_should_return_empty(
+    client, session, author
+):
+    session.add_all(BookFactory.create_batch(5, year=2000))
+    await session.commit()
 
     response = client.get('/book/?year=2024')
 
     assert response.json()['books'] == []
 
 
-def test_list_books_filter_combined_should_return_5_books(
+@pytest.mark.asyncio
+async def test_list_books_filter_combined_should_return_5_books(
     session, client, author
 ):
     expected_books = 5
     books = BookFactory.create_batch(7, year=2000)
     books[-1].title = 'title'
     books[0].year = 2024
-    session.bulk_save_objects(books)
-    session.commit()
+    session.add_all(books)
+    await session.commit()
 
     response = client.get('/book/?year=2000&name=oo')
 
     assert len(response.json()['books']) == expected_books
 
 
-def test_list_books_pagination_should_return_20_books(session, client, author):
+@pytest.mark.asyncio
+async def test_list_books_pagination_should_return_20_books(
+    session, client, author
+):
     expected_books = 20
-    session.bulk_save_objects(BookFactory.create_batch(25, year=2000))
-    session.commit()
+    session.add_all(BookFactory.create_batch(25, year=2000))
+    await session.commit()
 
     response = client.get('/book/?title=2000')
 
     assert len(response.json()['books']) == expected_books
+
+
+@pytest.mark.asyncio
+async def test_list_books_cursor_pagination(session, client, author):
+    expected_books = 25
+    session.add_all(BookFactory.create_batch(expected_books, year=2000))
+    await session.commit()
+
+    response = client.get('/book/?limit=10')
+    seen = [book['id'] for book in response.json()['books']]
+    cursor = response.json()['next_cursor']
+
+    while cursor:
+        response = client.get(f'/book/?limit=10&cursor={cursor}')
+        seen.extend(book['id'] for book in response.json()['books'])
+        cursor = response.json()['next_cursor']
+
+    assert seen == sorted(seen)
+    assert len(set(seen)) == expected_books
+
+
+def test_list_books_invalid_cursor(client):
+    response = client.get('/book/?cursor=not-a-cursor')
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json() == {'detail': 'Invalid cursor.'}
+
+
+@pytest.mark.asyncio
+async def test_list_books_search_sort_relevance(session, client, author):
+    session.add_all([
+        BookFactory(title='the dune encyclopedia', year=2000),
+        BookFactory(title='dune', year=2000),
+        BookFactory(title='children of dune', year=2000),
+    ])
+    await session.commit()
+
+    response = client.get('/book/?name=dune&sort=relevance')
+
+    titles = [book['title'] for book in response.json()['books']]
+    assert titles[0] == 'dune'
+    assert sorted(titles) == sorted([
+        'the dune encyclopedia',
+        'dune',
+        'children of dune',
+    ])
+
+
+@pytest.mark.asyncio
+async def test_list_books_relevance_pages_follow_offset(
+    session, client, author
+):
+    titles = ['the dune encyclopedia', 'dune', 'children of dune']
+    session.add_all([BookFactory(title=title, year=2000) for title in titles])
+    await session.commit()
+
+    first = client.get('/book/?name=dune&sort=relevance&limit=2').json()
+    second = client.get(
+        '/book/?name=dune&sort=relevance&limit=2&offset=2'
+    ).json()
+
+    assert first['next_cursor'] is None
+    assert sorted(
+        book['title'] for book in first['books'] + second['books']
+    ) == sorted(titles)
+
+
+def test_list_books_cursor_requires_sort_id(client):
+    response = client.get('/book/?sort=relevance&cursor=eyJpZCI6IDF9')
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json() == {'detail': 'Cursor pagination requires sort=id.'}
+
+
+def test_add_books_bulk_json(client, token, book):
+    expected_inserted = 2
+    response = client.post(
+        '/book/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json=[
+            {'year': 2000, 'title': 'first', 'author_id': 1},
+            {'year': 2000, 'title': book.title, 'author_id': 1},
+            {'year': 2000, 'title': 'no author', 'author_id': 99},
+            {'year': 1000, 'title': 'too old', 'author_id': 1},
+            {'year': 2001, 'title': 'First', 'author_id': 1},
+            {'year': 2001, 'title': 'second', 'author_id': 1},
+        ],
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    result = response.json()
+    assert result['inserted'] == expected_inserted
+    assert [error['index'] for error in result['errors']] == [1, 2, 3, 4]
+    assert result['errors'][0]['detail'] == f'{book.title} already in MADR.'
+    assert result['errors'][1]['detail'] == 'Author with ID 99 not found.'
+    assert result['errors'][3]['detail'] == 'first already in MADR.'
+
+
+class DeadlockDetected(Exception):
+    sqlstate = '40P01'
+
+
+def test_add_books_bulk_retries_a_deadlocked_batch(
+    session, client, token, author, monkeypatch
+):
+    expected_inserted = 2
+    execute = session.execute
+    deadlocks = [OperationalError('INSERT', {}, DeadlockDetected())]
+
+    async def deadlock_once(statement, *args, **kwargs):
+        if deadlocks and statement.is_insert:
+            raise deadlocks.pop()
+        return await execute(statement, *args, **kwargs)
+
+    monkeypatch.setattr(session, 'execute', deadlock_once)
+    response = client.post(
+        '/book/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json=[
+            {'year': 2000, 'title': 'first', 'author_id': author.id},
+            {'year': 1999, 'title': 'second', 'author_id': author.id},
+        ],
+    )
+
+    assert response.json() == {'inserted': expected_inserted, 'errors': []}
+    assert not deadlocks
+
+
+def test_add_books_bulk_ndjson(client, token, author):
+    expected_books = 2
+    body = '\n'.join([
+        '{"year": 2000, "title": "one", "author_id": 1}',
+        'not json',
+        '{"year": 2000, "title": "two", "author_id": 1}',
+    ])
+
+    response = client.post(
+        '/book/bulk',
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/x-ndjson',
+        },
+        content=body,
+    )
+
+    assert response.json() == {
+        'inserted': expected_books,
+        'errors': [{'index': 1, 'detail': 'Invalid JSON.'}],
+    }
+    response = client.get('/book/?year=2000')
+    assert len(response.json()['books']) == expected_books
+
+
+def test_add_books_bulk_rejects_non_array(client, token):
+    response = client.post(
+        '/book/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'year': 2000, 'title': 'one', 'author_id': 1},
+    )
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_export_books_ndjson(session, client, author):
+    books = BookFactory.create_batch(3, year=2000)
+    session.add_all(books)
+    await session.commit()
+
+    response = client.get('/book/export')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {
+            'id': book.id,
+            'year': book.year,
+            'title': book.title,
+            'author_id': book.author_id,
+        }
+        for book in books
+    ]
+
+
+def test_export_books_csv(client, book):
+    response = client.get('/book/export?format=csv')
+
+    assert response.headers['content-type'].startswith('text/csv')
+    assert response.text.splitlines() == [
+        'id,year,title,author_id',
+        f'{book.id},{book.year},{book.title},{book.author_id}',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_book_by_id_etag_not_modified(session, client, author):
+    book = BookFactory(year=2000)
+    session.add(book)
+    await session.commit()
+
+    response = client.get(f'/book/{book.id}')
+    etag = response.headers['etag']
+
+    response = client.get(f'/book/{book.id}', headers={'If-None-Match': etag})
+
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.headers['etag'] == etag
+    assert not response.content
+
+
+@pytest.mark.asyncio
+async def test_get_book_by_id_cache_invalidated_on_patch(
+    session, client, token, author
+):
+    updated_year = 2001
+    book = BookFactory(year=2000)
+    session.add(book)
+    await session.commit()
+
+    etag = client.get(f'/book/{book.id}').headers['etag']
+    client.patch(
+        f'/book/{book.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'year': updated_year},
+    )
+
+    response = client.get(f'/book/{book.id}', headers={'If-None-Match': etag})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['year'] == updated_year
+    assert response.headers['etag'] != etag
+
+
+@pytest.mark.asyncio
+async def test_get_book_by_id_cache_fill_loses_to_invalidation(
+    session, client, author, monkeypatch
+):
+    book = BookFactory(year=2000)
+    session.add(book)
+    await session.commit()
+    scalar = session.scalar
+
+    async def scalar_then_patch(query):
+        # The PATCH commits while the GET is between its SELECT and `set`.
+        row = await scalar(query)
+        book_cache.pop(book.id)
+        return row
+
+    monkeypatch.setattr(session, 'scalar', scalar_then_patch)
+    client.get(f'/book/{book.id}')
+
+    assert book_cache.get(book.id) is None
+
+
+@pytest.mark.asyncio
+async def test_book_stats_follow_writes(session, client, token, author):
+    session.add_all(BookFactory.create_batch(3, year=2000))
+    await session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    client.patch('/book/1', headers=headers, json={'year': 2010})
+    client.delete('/book/2', headers=headers)
+
+    response = client.get('/book/stats')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'books': 2,
+        'years': [{'year': 2000, 'books': 1}, {'year': 2010, 'books': 1}],
+    }
+
+
+@pytest.mark.asyncio
+async def test_rebuild_book_stats(session, client, author):
+    session.add_all(BookFactory.create_batch(2, year=2000))
+    await session.commit()
+    # Drift the counters, then recompute them from the books table.
+    await session.execute(update(Book).values(year=1990))
+    await session.execute(update(BookYearStats).values(books=7))
+    await session.commit()
+
+    await rebuild_stats(session)
+
+    assert client.get('/book/stats').json() == {
+        'books': 2,
+        'years': [{'year': 1990, 'books': 2}],
+    }
+
+
+@pytest.mark.asyncio
+async def test_get_books_by_ids_keeps_request_order(session, client, author):
+    session.add_all(BookFactory.create_batch(3, year=2000))
+    await session.commit()
+
+    response = client.get('/book/?ids=3,99,1,3')
+
+    assert response.status_code == HTTPStatus.OK
+    assert [book['id'] for book in response.json()['books']] == [3, 1]
+    assert response.json()['missing'] == [99]
+
+
+def test_batch_get_books(client, book):
+    response = client.post('/book/batch-get', json={'ids': [book.id, 42]})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'books': [
+            {
+                'id': book.id,
+                'year': book.year,
+                'title': book.title,
+                'author_id': book.author_id,
+            }
+        ],
+        'missing': [42],
+    }
+
+
+def test_get_books_by_ids_invalid(client):
+    response = client.get('/book/?ids=1,a')
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json() == {
+        'detail': 'Invalid ids, expected comma-separated integers.'
+    }
+
+
+def test_batch_get_books_too_many_ids(client, monkeypatch):
+    monkeypatch.setattr(settings, 'BATCH_GET_MAX_IDS', 2)
+
+    response = client.post('/book/batch-get', json={'ids': [1, 2, 3]})
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json() == {'detail': 'At most 2 ids per request.'}
+
+
+@pytest.mark.asyncio
+async def test_suggest_books_follows_writes(session, client, token, author):
+    session.add_all([
+        BookFactory(title='dom casmurro'),
+        BookFactory(title='dom quixote'),
+        BookFactory(title='memorias postumas'),
+    ])
+    await session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.get('/book/suggest?q=  DOM ')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'suggestions': [
+            {'id': 1, 'name': 'dom casmurro'},
+            {'id': 2, 'name': 'dom quixote'},
+        ]
+    }
+
+    client.delete('/book/1', headers=headers)
+    client.post(
+        '/book',
+        headers=headers,
+        json={'year': 2000, 'title': 'Dom Pedro', 'author_id': author.id},
+    )
+
+    response = client.get('/book/suggest?q=dom&limit=5')
+
+    assert [s['name'] for s in response.json()['suggestions']] == [
+        'dom pedro',
+        'dom quixote',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_suggest_reload_runs_once_and_keeps_concurrent_writes(
+    session, author, monkeypatch
+):
+    session.add_all([
+        BookFactory(title='dom casmurro'),
+        BookFactory(title='dom quixote'),
+    ])
+    await session.commit()
+    index = PrefixIndex(Book.title)
+    index.rebuild([(1, 'dom casmurro')])
+    index.built_at = float('-inf')
+
+    loads = []
+    release = asyncio.Event()
+    execute = session.execute
+
+    async def slow_execute(query):
+        loads.append(query)
+        await release.wait()
+        return await execute(query)
+
+    monkeypatch.setattr(session, 'execute', slow_execute)
+    reload = asyncio.create_task(index.refresh(session))
+    await asyncio.sleep(0)
+
+    # A second stale request serves the old entries instead of loading.
+    await index.refresh(session)
+    assert index.search('dom', limit=5) == [('dom casmurro', 1)]
+
+    # Writes made while the reload reads must survive it.
+    index.remove(2)
+    index.add(3, 'dom pedro')
+    release.set()
+    await reload
+
+    assert len(loads) == 1
+    assert index.search('dom', limit=5) == [
+        ('dom casmurro', 1),
+        ('dom pedro', 3),
+    ]
+
+
+def test_list_books_cached_until_a_write(client, token, book):
+    expected_year = 1999
+    first = client.get('/book/?limit=20&offset=0')
+    hits = search_cache.hits
+
+    # Spelling out the defaults still hits the same entry.
+    response = client.get('/book/')
+    assert response.json() == first.json()
+    assert search_cache.hits == hits + 1
+
+    client.patch(
+        f'/book/{book.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'year': expected_year},
+    )
+    response = client.get('/book/')
+
+    assert search_cache.hits == hits + 1
+    assert response.json()['books'][0]['year'] == expected_year
+
+
+def test_search_cache_evicts_by_bytes():
+    expected_bytes = 8
+    cache = SearchCache(maxsize=10, ttl=60, maxbytes=10, max_entry_bytes=6)
+
+    cache.set('a', b'aaaa')
+    cache.set('b', b'bbbb')
+    cache.set('c', b'cccc')
+    cache.set('huge', b'h' * 7)
+
+    assert cache.get('a') is None
+    assert cache.get('huge') is None
+    assert cache.get('c') == b'cccc'
+    assert cache.nbytes == expected_bytes
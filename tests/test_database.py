@@ -0,0 +1,146 @@
+import logging
+import sqlite3
+from time import time
+
+import pytest
+from fastapi import Response
+from sqlalchemy import exc, insert, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database import (
+    LAST_WRITE_COOKIE,
+    InstrumentedQueuePool,
+    ReplicaSet,
+    insert_returning,
+    instrument_pool,
+    pool_stats,
+    remember_writes,
+)
+from src.models import Author
+from src.slow_queries import explain, install_slow_query_log
+
+POOL_TIMEOUT = 0.1
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_track_checkouts(tmp_path):
+    engine = create_async_engine(
+        f'sqlite+aiosqlite:///{tmp_path}/pool.db',
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=POOL_TIMEOUT,
+    )
+    stats = instrument_pool(engine, 'test')
+
+    async with engine.connect() as conn:
+        await conn.execute(text('SELECT 1'))
+
+        assert stats.in_use == 1
+        assert stats.checkouts == 1
+        assert pool_stats['primary'].in_use == 0
+
+        with pytest.raises(exc.TimeoutError):
+            await engine.connect().start()
+
+    assert stats.in_use == 0
+    assert stats.timeouts == 1
+    assert stats.checkout_wait_max >= POOL_TIMEOUT
+
+    await engine.dispose()
+    del pool_stats['test']
+
+
+@pytest.mark.asyncio
+async def test_slow_query_log_captures_plan_once_per_interval(
+    tmp_path, caplog
+):
+    engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path}/slow.db')
+    install_slow_query_log(engine, threshold_ms=0, interval=60)
+    query = text('SELECT * FROM books WHERE title = :title')
+
+    async with engine.connect() as conn:
+        await conn.execute(
+            text('CREATE TABLE books (id INTEGER PRIMARY KEY, title TEXT)')
+        )
+        with caplog.at_level(logging.WARNING, logger='madr.slow_query'):
+            await conn.execute(query, {'title': 'secret title'})
+            await conn.execute(query, {'title': 'secret title'})
+
+    expected_logs = 1
+    slow_queries = [
+        record.getMessage()
+        for record in caplog.records
+        if 'WHERE title' in record.getMessage()
+    ]
+    assert len(slow_queries) == expected_logs
+    assert 'SCAN books' in slow_queries[0]
+    assert "['<str>']" in slow_queries[0]
+    assert 'secret title' not in slow_queries[0]
+
+    await engine.dispose()
+
+
+def test_failed_explain_leaves_the_transaction_usable(tmp_path):
+    # The savepoint path is the one taken on PostgreSQL, where a failed
+    # statement would otherwise abort the request's transaction.
+    conn = sqlite3.connect(tmp_path / 'explain.db', isolation_level=None)
+    conn.execute('CREATE TABLE books (id INTEGER PRIMARY KEY)')
+    conn.execute('BEGIN')
+    conn.execute('INSERT INTO books (id) VALUES (1)')
+
+    plan = explain(conn, 'postgresql', 'SELECT * FROM missing', ())
+
+    assert plan[0].startswith('EXPLAIN failed:')
+    assert conn.in_transaction
+    assert conn.execute('SELECT id FROM books').fetchall() == [(1,)]
+    conn.execute('COMMIT')
+    conn.close()
+
+
+@pytest.mark.asyncio
+async def test_insert_returning_maps_integrity_error_to_none(session, author):
+    statement = insert(Author).values(name=author.name).returning(Author.id)
+
+    assert await insert_returning(session, statement) is None
+
+
+def test_replica_set_routing():
+    primary, first, second = (
+        create_async_engine(f'sqlite+aiosqlite:///{name}.db')
+        for name in ('primary', 'first', 'second')
+    )
+    replicas = ReplicaSet(
+        primary,
+        [first, second],
+        eject_seconds=60,
+        read_your_writes_seconds=60,
+    )
+
+    assert [replicas.choose() for _ in range(3)] == [first, second, first]
+    assert replicas.choose(read_primary=True) is primary
+
+    replicas.eject(1)
+    assert [replicas.choose() for _ in range(2)] == [first, first]
+
+    replicas.eject(0)
+    assert replicas.choose() is primary
+
+    assert replicas.wrote_recently(f'{time()}')
+    assert not replicas.wrote_recently(f'{time() - 61}')
+    assert not replicas.wrote_recently('not a timestamp')
+    assert not replicas.wrote_recently(None)
+
+
+@pytest.mark.asyncio
+async def test_remember_writes_sets_last_write_cookie_on_commit(session):
+    response = Response()
+    remember_writes(session, response)
+
+    await session.execute(select(Author))
+    assert 'set-cookie' not in response.headers
+
+    session.add(Author(name='andrew'))
+    await session.commit()
+
+    assert response.headers['set-cookie'].startswith(f'{LAST_WRITE_COOKIE}=')
@@ -0,0 +1,145 @@
+import re
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, insert, text
+
+from src.models import Author, Book
+
+AUTHORS = 10_000
+BOOKS = 20_000
+YEARS = 200
+FIRST_YEAR = 1801
+
+# Tables big enough that reading all of them is a bug.
+SEEDED = ('books', 'authors', 'author_year_stats')
+
+# 'SEARCH books USING INDEX ...' passes; 'SCAN books', with or without an
+# index to walk, reads every row. `\b` keeps 'SCAN books_fts' out.
+SQLITE_FULL_SCAN = re.compile(rf'^SCAN ({"|".join(SEEDED)})\b')
+
+
+@pytest_asyncio.fixture
+async def seeded(session):
+    await session.execute(
+        insert(Author),
+        [{'name': f'author {n:05d}'} for n in range(AUTHORS)],
+    )
+    await session.execute(
+        insert(Book),
+        [
+            {
+                'year': FIRST_YEAR + n % YEARS,
+                'title': f'title {n:05d}',
+                'author_id': 1 + n % AUTHORS,
+            }
+            for n in range(BOOKS)
+        ],
+    )
+    await session.commit()
+    await session.execute(text('ANALYZE'))
+    await session.commit()
+
+    return session
+
+
+@pytest.fixture
+def statements(seeded):
+    """SELECTs sent to the database while the fixture is active."""
+    sent = []
+
+    def capture(statement, parameters, **kw):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            sent.append((statement, parameters))
+
+    sync_engine = seeded.bind.sync_engine
+    event.listen(sync_engine, 'before_cursor_execute', capture, named=True)
+    yield sent
+    event.remove(sync_engine, 'before_cursor_execute', capture)
+
+
+def pg_full_scans(node: dict) -> list[str]:
+    """Seq scans, and index scans with no Index Cond (a walk of the whole
+    index, e.g. the pkey for ORDER BY id, filtering every row)."""
+    scans = []
+    relation = node.get('Relation Name')
+
+    if relation in SEEDED and (
+        node['Node Type'] == 'Seq Scan'
+        or (
+            node['Node Type'] in {'Index Scan', 'Index Only Scan'}
+            and 'Index Cond' not in node
+        )
+    ):
+        scans.append(f'{node["Node Type"]} on {relation}')
+
+    for child in node.get('Plans', []):
+        scans.extend(pg_full_scans(child))
+
+    return scans
+
+
+async def full_scans(session, statement: str, parameters) -> list[str]:
+    conn = await session.connection()
+
+    if session.bind.dialect.name == 'sqlite':
+        rows = await conn.exec_driver_sql(
+            f'EXPLAIN QUERY PLAN {statement}', parameters
+        )
+        return [
+            row.detail for row in rows if SQLITE_FULL_SCAN.search(row.detail)
+        ]
+
+    plan = await conn.exec_driver_sql(
+        f'EXPLAIN (FORMAT JSON) {statement}', parameters
+    )
+    return pg_full_scans(plan.scalar()[0]['Plan'])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'url',
+    [
+        '/book/?name=title 01234',
+        '/book/?name=title 01234&sort=relevance',
+        f'/book/?year={FIRST_YEAR}',
+        '/book/?ids=3,1,2',
+        '/book/5',
+        '/author/?name=author 00042',
+        '/author/?name=author 00042&include=books',
+        '/author/?ids=3,1,2',
+        '/author/7',
+        '/author/7/books',
+        '/author/7/stats',
+    ],
+)
+async def test_router_queries_use_an_index(seeded, statements, client, url):
+    response = client.get(url)
+    assert response.is_success
+
+    assert statements
+    for statement, parameters in statements:
+        scans = await full_scans(seeded, statement, parameters)
+        assert not scans, (statement, scans)
+
+
+def test_pg_full_scans_flags_filter_only_index_walks():
+    plan = {
+        'Node Type': 'Limit',
+        'Plans': [
+            {
+                'Node Type': 'Index Scan',
+                'Relation Name': 'books',
+                'Index Name': 'books_pkey',
+                'Filter': '(author_id = 1)',
+            },
+            {
+                'Node Type': 'Index Scan',
+                'Relation Name': 'authors',
+                'Index Name': 'authors_pkey',
+                'Index Cond': '(id = 1)',
+            },
+        ],
+    }
+
+    assert pg_full_scans(plan) == ['Index Scan on books']
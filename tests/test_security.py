@@ -1,11 +1,23 @@
+import asyncio
+import threading
 from http import HTTPStatus
 
 import pytest
 from fastapi import HTTPException
-from jwt import decode
+from freezegun import freeze_time
+from jwt import ExpiredSignatureError, decode
 
 from src.database import T_Session
-from src.security import create_access_token, get_current_user, settings
+from src.security import (
+    HashingPool,
+    create_access_token,
+    decode_token,
+    get_current_user,
+    get_password_hash,
+    settings,
+    token_cache,
+    user_cache,
+)
 
 
 def test_jwt():
@@ -29,11 +41,74 @@ def test_jwt_invalid_token(client):
     assert response.json() == {'detail': 'Could not validate credentials.'}
 
 
-def test_token_with_no_user():
+def test_decode_token_cached_until_exp():
+    with freeze_time('2024-01-01 12:00:00'):
+        token = create_access_token({'sub': 'test@test.com'})
+        decode_token(token)
+        hits = token_cache.hits
+
+        assert decode_token(token)['sub'] == 'test@test.com'
+        assert token_cache.hits == hits + 1
+
+    with freeze_time('2024-01-01 13:01:00'):
+        with pytest.raises(ExpiredSignatureError):
+            decode_token(token)
+
+
+@pytest.mark.asyncio
+async def test_token_with_no_user():
     encoded_token = create_access_token(data={})
 
     with pytest.raises(HTTPException) as excinfo:
-        get_current_user(session=T_Session, token=encoded_token)
+        await get_current_user(session=T_Session, token=encoded_token)
 
     assert excinfo.value.status_code == HTTPStatus.UNAUTHORIZED
     assert excinfo.value.detail == 'Could not validate credentials.'
+
+
+def test_current_user_served_from_cache(client, token):
+    headers = {'Authorization': f'Bearer {token}'}
+
+    client.post('/auth/refresh_token', headers=headers)
+    hits = user_cache.hits
+    response = client.post('/auth/refresh_token', headers=headers)
+
+    assert response.status_code == HTTPStatus.OK
+    assert user_cache.hits == hits + 1
+
+
+def test_cached_user_invalidated_on_email_change(client, user, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post('/auth/refresh_token', headers=headers)
+
+    client.put(
+        f'/users/{user.id}',
+        headers=headers,
+        json={
+            'username': user.username,
+            'email': 'changed@test.com',
+            'password': 'changed',
+        },
+    )
+    response = client.post('/auth/refresh_token', headers=headers)
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_hashing_pool_rejects_when_full():
+    pool = HashingPool(workers=1, queue_size=0)
+    release = threading.Event()
+
+    busy = asyncio.create_task(pool.run(release.wait))
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as excinfo:
+        await pool.run(get_password_hash, 'secret')
+
+    release.set()
+    await busy
+
+    assert excinfo.value.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert pool.rejected == 1
+    assert pool.pending == 0